@@ -1,10 +1,15 @@
 import asyncio
-import re
-import requests
-import json
+import functools
+import html
 import os
+import socket
+import sys
+import time
 
 from telegram import (
+    Bot,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
     Update,
     ReplyKeyboardMarkup,
     KeyboardButton,
@@ -12,234 +17,417 @@ from telegram import (
 )
 from telegram.ext import (
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
     filters,
     ContextTypes,
 )
-from ntscraper import Nitter
-from telethon import TelegramClient
-from telethon.tl.functions.channels import GetFullChannelRequest
-from telethon.errors import ChannelInvalidError, ChannelPrivateError, UsernameNotOccupiedError
-from dotenv import load_dotenv
+from telegram.error import Forbidden
+
+from newpairs import (
+    AlertQueue,
+    Monitor,
+    QueueSink,
+    StoreSink,
+    Supervisor,
+    display_count,
+    enrich_stats,
+    enrich_token,
+    load_social_history,
+    start_telethon,
+)
+from newpairs.config import ENRICH_CONCURRENCY, SOCIAL_HISTORY_DAYS, WEBHOOK_CONCURRENCY, WEBHOOK_PORT
+from newpairs.token_store import (
+    load_chat_state,
+    load_known_chains,
+    load_recent_tokens,
+    load_subscribed_chats,
+    load_token,
+    load_tokens_after,
+    update_chat_state,
+    update_tokens,
+)
+from newpairs.webhook import run_webhook
 
 # ------------------------------------------------------------------------------
 # Environment Setup
 # ------------------------------------------------------------------------------
-load_dotenv()
-
-API_ID = 23029837
-API_HASH = "2cd4f5ead73424ff9a02da5f66de76eb"
-SESSION_PATH = "session_name"  # Name of your pre-saved session file
-TOKEN_FILE = "tokens.json"     # File where tokens are stored
-
-# Initialize Telethon client
-telethon_client = TelegramClient(SESSION_PATH, API_ID, API_HASH)
+BOT_TOKEN = os.getenv("BOT_TOKEN", "8141585234:AAF7SpJPDpvmQGmkRmhUhxCIpxNs0soQQYI")
+
+# Run mode (first CLI argument or RUN_MODE env var):
+#   all     -> ingestion + Telegram bot + delivery in one process (default)
+#   ingest  -> poll DexScreener, enrich, store and queue alerts
+#   bot     -> Telegram command handling + one delivery worker
+#   deliver -> delivery worker only (run as many as needed)
+# The split modes share alerts.db, token_archive/ and chat_state.json on the
+# local disk, so they must all run on one host in the same working directory.
+RUN_MODES = ("all", "ingest", "bot", "deliver")
+RUN_MODE = sys.argv[1] if len(sys.argv) > 1 else os.getenv("RUN_MODE", "all")
+DEFAULT_CHAT_ID = os.getenv("DEFAULT_CHAT_ID")  # Always gets live alerts, as if it ran /start
+WORKER_NAME = f"{socket.gethostname()}:{os.getpid()}"
+
+# Durable queue between ingestion and delivery
+alert_queue = AlertQueue()
+
+# Mapping from normalized chain names to Telegram channel links
+chain_channels = {
+    "hbar": "https://t.me/+-GNRIXL75FdlMzA0",
+    "bera": "https://t.me/+-nNZ7GRsDD8yOTRk",
+    "base": "https://t.me/+Z7bIbiZSvmw2MDg0",
+    "ink": "https://t.me/+bgkM-tOrCvBmNjk0",
+    "xrp": "https://t.me/+JQ4yRr7UWxtiOTFk",
+    "sui": "https://t.me/+qHwlrzvNvNJlZDI0"
+}
+
+# Destinations that get one digest per window instead of one message per token.
+# Keys are chain names from chain_channels, or "default" for the subscribed
+# chats (each chat's digest lists the tokens that pass its filters); values are
+# (window in seconds, max tokens per digest). Everything else is sent
+# immediately. Override with e.g. DIGEST_DESTINATIONS="default=60:20,base=30:10".
+def parse_digest_destinations(spec: str) -> dict:
+    """
+    Parse "name=window:max,..."; exits with a clear message on a bad entry or a
+    name that is neither "default" nor a chain with a channel.
+    """
+    destinations = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, values = item.partition("=")
+        try:
+            window, max_tokens = (int(v) for v in values.split(":"))
+            if not name.strip() or window <= 0 or max_tokens <= 0:
+                raise ValueError
+        except ValueError:
+            raise SystemExit(
+                f"Invalid DIGEST_DESTINATIONS entry '{item.strip()}': expected name=window:max "
+                "with positive integers, e.g. default=60:20"
+            )
+        name = name.strip().lower()
+        if name != "default" and name not in chain_channels:
+            raise SystemExit(
+                f"Invalid DIGEST_DESTINATIONS entry '{item.strip()}': '{name}' is not \"default\" "
+                f"or a chain with a channel ({', '.join(sorted(chain_channels))})"
+            )
+        destinations[name] = (window, max_tokens)
+    return destinations
+
+digest_destinations = {
+    "default": (60, 20),
+}
+if os.getenv("DIGEST_DESTINATIONS") is not None:
+    digest_destinations = parse_digest_destinations(os.getenv("DIGEST_DESTINATIONS"))
+DIGEST_TOP_N = 10  # Tokens listed (with a details button) per digest
+# Batches left behind by a destination that was removed from DIGEST_DESTINATIONS
+# are sent at once, in digests of up to this many tokens
+ORPHAN_BATCH_SIZE = 20
+
+# Messages one delivery worker sends at the same time when an alert or digest
+# goes to many chats (Telegram allows about 30 per second per bot)
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "10"))
+
+# Most tokens one "Show Current Filtered" request enriches; the rest are
+# checked on the next request
+ON_DEMAND_LIMIT = int(os.getenv("ON_DEMAND_ENRICH_LIMIT", "50"))
 
-async def start_telethon():
-    await telethon_client.start()
-    print("Telethon client started successfully!")
+# ------------------------------------------------------------------------------
+# Ingestion: Continuously Poll DexScreener
+# ------------------------------------------------------------------------------
+def chain_demand(chain_id: str) -> int:
+    """
+    How much live alerts want a chain's new tokens right now:
+    0 -> no channel, and every subscribed chat's chain filter excludes it
+    1 -> it would only reach subscribed chats without a chain filter
+    2 -> it has a dedicated channel or a subscribed chat filters for it
+    """
+    if chain_id in chain_channels:
+        return 2
+    chain_filters = {state["chain_filter"] or None for state in get_subscribers().values()}
+    if chain_id in chain_filters:
+        return 2
+    return 1 if None in chain_filters else 0
+
+async def save_late_result(token: dict):
+    """Record lookups that finished after the alert went out in the token history."""
+    # Tokens not stored yet will be stored with the late values already in place
+    if "seq" in token:
+        await asyncio.to_thread(update_tokens, [token])
+
+def build_ingest_monitor() -> Monitor:
+    """
+    Store each new token uniquely (JSON file) and put it on the alert queue.
+    Tokens already queued by a previous run are skipped without re-enriching.
+    Tokens no live alert could use are stored without enrichment (see
+    enrich_on_demand). The social-link index is seeded from recent history so
+    reuse counts survive restarts.
+    """
+    load_social_history(load_recent_tokens(SOCIAL_HISTORY_DAYS))
+    return Monitor(
+        [StoreSink(), QueueSink(alert_queue)],
+        poll_interval=2,
+        is_known=alert_queue.contains,
+        demand=chain_demand,
+        on_late=save_late_result,
+    )
 
-asyncio.get_event_loop().run_until_complete(start_telethon())
+async def enrich_on_demand(tokens: list):
+    """
+    Enrich stored tokens that were skipped at ingest time and save the results.
+    Telethon is only connected in processes that ingest, so other processes
+    fill in Twitter followers only.
+    """
+    pending = [t for t in tokens if not t.get("enriched", True)]
+    if not pending:
+        return
+    slots = asyncio.Semaphore(ENRICH_CONCURRENCY)
 
-# Nitter for Twitter stats
-nitter_client = Nitter("https://nitter.privacydev.net")
+    async def enrich(token):
+        async with slots:
+            await enrich_token(token, telegram_lookup=RUN_MODE == "all", on_late=save_late_result)
 
-# DexScreener endpoint
-TOKEN_PROFILES_URL = "https://api.dexscreener.com/token-profiles/latest/v1"
+    await asyncio.gather(*(enrich(t) for t in pending))
+    await asyncio.to_thread(update_tokens, pending)
 
 # ------------------------------------------------------------------------------
-# JSON File Helpers
+# Delivery: Send Queued Alerts
 # ------------------------------------------------------------------------------
-def load_tokens_from_file() -> list:
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return []
-    return []
-
-def save_tokens_to_file(tokens: list):
-    with open(TOKEN_FILE, "w") as f:
-        json.dump(tokens, f, indent=2)
-
-def append_token_to_file(token: dict):
-    tokens = load_tokens_from_file()
-    # Check if token_address already exists
-    if any(t.get("token_address") == token.get("token_address") for t in tokens):
-        return
-    tokens.append(token)
-    save_tokens_to_file(tokens)
+SOCIAL_REUSE_LABELS = {
+    "twitter": "Twitter handle",
+    "telegram": "Telegram group",
+    "website": "Website domain",
+}
+
+def format_social_reuse(token: dict) -> str:
+    """One warning line per link that earlier tokens already used."""
+    return "".join(
+        f"⚠️ <b>{SOCIAL_REUSE_LABELS[kind]}</b> used by <code>{count}</code> previous token{'s' if count != 1 else ''}\n"
+        for kind, count in token.get("social_reuse", {}).items()
+    )
 
-# ------------------------------------------------------------------------------
-# Helper Functions for Data Extraction
-# ------------------------------------------------------------------------------
-def parse_twitter_handle(twitter_url: str) -> str:
-    if not twitter_url:
-        return None
-    base_url = twitter_url.split('/status/')[0]
-    pattern = r"https?://(x\.com|twitter\.com)/([^/]+)"
-    match = re.match(pattern, base_url)
-    return match.group(2) if match else None
-
-def get_twitter_followers(twitter_url: str) -> int:
-    handle = parse_twitter_handle(twitter_url)
-    if not handle:
-        return 0
-    try:
-        profile = nitter_client.get_profile_info(handle + "/")
-        if profile and 'stats' in profile:
-            return profile['stats'].get('followers', 0)
-    except Exception as e:
-        print(f"[Nitter Error] {e}")
-    return 0
-
-async def get_telegram_member_count(telegram_url: str) -> int:
-    if not telegram_url:
-        return 0
-    pattern = r"https?://t\.me/([^/?]+)"
-    match = re.match(pattern, telegram_url)
-    if not match:
-        return 0
-    username = match.group(1)
+# Token fields come from untrusted DexScreener profiles: escape everything that
+# goes into an HTML message, or one stray quote makes Telegram reject it.
+def html_text(value: str) -> str:
+    return "<i>N/A</i>" if not value or value == "N/A" else html.escape(value)
+
+def html_link(url: str) -> str:
+    if not url or url == "N/A":
+        return "<i>N/A</i>"
+    url = html.escape(url)
+    return f'<a href="{url}">{url}</a>'
+
+def dexscreener_link(token: dict) -> str:
+    return html_link(f"https://dexscreener.com/{token['chain_id'].lower()}/{token['token_address'].lower()}")
+
+def format_alert(token: dict) -> str:
+    divider = "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    return (
+        "<b>🚀 NEW TOKEN ALERT 🚀</b>" + divider +
+        f"<b>Chain:</b> <code>{html.escape(token['chain_id'])}</code>\n"
+        f"<b>Token Address:</b> <code>{html.escape(token['token_address'])}</code>\n"
+        f"<b>Website:</b> {html_text(token['website_url'])}\n"
+        f"<b>Telegram:</b> {html_link(token['telegram_url'])}"
+        f" (<code>{display_count(token, 'telegram_members')}</code> Members)\n"
+        f"<b>Twitter:</b> {html_link(token['twitter_url'])}"
+        f" (<code>{display_count(token, 'followers')}</code> Followers)\n"
+        f"<b>Dexscreener:</b> {dexscreener_link(token)}" +
+        (divider + format_social_reuse(token).rstrip("\n") if token.get("social_reuse") else "") +
+        divider +
+        "<i>Stay updated with the latest tokens!</i>"
+    )
+
+def get_subscribers() -> dict:
+    """
+    Chats that get live alerts for chains without a channel, with their
+    filters: every chat that ran /start, plus DEFAULT_CHAT_ID if set.
+    """
+    chats = load_subscribed_chats()
+    if DEFAULT_CHAT_ID:
+        chats.setdefault(int(DEFAULT_CHAT_ID), load_chat_state(int(DEFAULT_CHAT_ID)))
+    return chats
+
+def chat_wants(state: dict, token: dict) -> bool:
+    """Whether a token passes a chat's chain and follower filters."""
+    return bool(apply_filter_to_tokens([token], state["chain_filter"], state["follower_filter"]))
+
+def get_recipients(destination: str) -> dict:
+    """
+    {target_chat: wants(token)} for a destination: a chain's channel takes
+    every token of its chain, subscribed chats apply their own filters.
+    """
+    if destination in chain_channels:
+        return {chain_channels[destination]: lambda token: True}
+    return {chat_id: functools.partial(chat_wants, state) for chat_id, state in get_subscribers().items()}
+
+def format_digest(tokens: list):
+    """
+    One compact message for a batch of tokens: the top DIGEST_TOP_N by Twitter
+    followers and Telegram members, each with a button that shows the full alert.
+    """
+    ranked = sorted(tokens, key=lambda t: (t["followers"] or 0, t["telegram_members"] or 0), reverse=True)
+    top = ranked[:DIGEST_TOP_N]
+    divider = "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+    lines = [
+        f"{i}. <code>{html.escape(t['chain_id'])}</code> <code>{html.escape(t['token_address'])}</code>\n"
+        f"    🐦 {display_count(t, 'followers')} · 💬 {display_count(t, 'telegram_members')}"
+        + (" · ⚠️ reused links" if t.get("social_reuse") else "")
+        for i, t in enumerate(top, start=1)
+    ]
+    more = len(ranked) - len(top)
+    msg = (
+        f"<b>🚀 {len(tokens)} NEW TOKENS 🚀</b>" + divider +
+        "\n".join(lines) +
+        (f"\n<i>+{more} more, see /filter → Show Current Filtered</i>" if more > 0 else "") +
+        divider +
+        "<i>Tap a number for full details.</i>"
+    )
+    buttons = [
+        InlineKeyboardButton(f"{i}", callback_data=f"details:{t['seq']}")
+        for i, t in enumerate(top, start=1)
+        if "seq" in t
+    ]
+    reply_markup = InlineKeyboardMarkup([buttons[:5], buttons[5:]]) if buttons else None
+    return msg, reply_markup
+
+async def release_alert(queue: AlertQueue, alert_id: int):
+    """Put a failed alert back for a later retry (or give up on it)."""
+    if await asyncio.to_thread(queue.release, alert_id):
+        print(f"[Delivery Error] Alert {alert_id} failed too often, moved to the failed state")
+
+async def send_alerts(bot: Bot, queue: AlertQueue, alerts: list, recipients: dict, render) -> bool:
+    """
+    Send alerts ([(alert_id, token), ...]) to every recipient: each gets
+    render(tokens) -> (text, reply_markup) for the tokens it wants and did not
+    get on an earlier attempt. Up to SEND_CONCURRENCY messages are in flight at
+    once. Returns False if a send failed; the recipients that got theirs are
+    recorded first, so the retry only goes to the others. A chat that blocked
+    the bot is unsubscribed instead of retried.
+    """
+    delivered = await asyncio.to_thread(queue.delivered_to, [alert_id for alert_id, _ in alerts])
+    rendered = {}   # Chats with the same filters get the same message, render it once
+    messages = []
+    for target, wants in recipients.items():
+        alert_ids = tuple(alert_id for alert_id, token in alerts
+                          if wants(token) and str(target) not in delivered[alert_id])
+        if not alert_ids:
+            continue
+        if alert_ids not in rendered:
+            rendered[alert_ids] = render([token for alert_id, token in alerts if alert_id in alert_ids])
+        messages.append((target, alert_ids, rendered[alert_ids]))
+
+    # True if sent, False if it failed, None if the chat was unsubscribed
+    results = [False] * len(messages)
+    queued = iter(enumerate(messages))
+
+    async def sender():
+        for i, (target, _, (text, reply_markup)) in queued:
+            try:
+                await bot.send_message(chat_id=target, text=text, parse_mode="HTML", reply_markup=reply_markup)
+                results[i] = True
+            except Exception as e:
+                print(f"[Delivery Error] {target}: {e}")
+                if isinstance(e, Forbidden) and isinstance(target, int):
+                    await asyncio.to_thread(update_chat_state, target, subscribed=False)
+                    results[i] = None
+
+    await asyncio.gather(*(sender() for _ in range(min(SEND_CONCURRENCY, len(messages)))))
+    if False not in results:
+        return True
+    for (target, alert_ids, _), sent in zip(messages, results):
+        if sent:
+            await asyncio.to_thread(queue.mark_delivered, list(alert_ids), str(target))
+    return False
+
+def render_alert(tokens: list):
+    return format_alert(tokens[0]), None
+
+async def send_due_digests(bot: Bot, queue: AlertQueue):
+    """
+    Send every due digest batch. Batches are kept in the queue and claimed as a
+    whole, so however many delivery workers run, each batch is sent once.
+    Destinations that are no longer in digest_destinations get what is still
+    batched for them right away.
+    """
+    schedule = {destination: (0, ORPHAN_BATCH_SIZE)
+                for destination in await asyncio.to_thread(queue.batched_destinations)}
+    schedule.update(digest_destinations)
+    for destination, (window, max_tokens) in schedule.items():
+        # A busy destination can have several full batches due at once
+        while alerts := await asyncio.to_thread(queue.claim_batch, destination, WORKER_NAME, window, max_tokens):
+            await send_digest(bot, queue, destination, alerts)
+
+async def send_digest(bot: Bot, queue: AlertQueue, destination: str, alerts: list):
     try:
-        entity = await telethon_client.get_entity(username)
-        if hasattr(entity, "broadcast") or hasattr(entity, "megagroup"):
-            full_channel = await telethon_client(GetFullChannelRequest(entity))
-            if hasattr(full_channel.full_chat, "participants_count"):
-                return full_channel.full_chat.participants_count
-            else:
-                return 0
-        if hasattr(entity, "participants_count"):
-            return entity.participants_count
-        return 0
-    except (ChannelInvalidError, ChannelPrivateError, UsernameNotOccupiedError) as e:
-        print(f"[Telethon Error] {e}")
+        recipients = await asyncio.to_thread(get_recipients, destination)
+        ok = await send_alerts(bot, queue, alerts, recipients, format_digest)
     except Exception as e:
-        print(f"[Unexpected Telethon Error] {e}")
-    return 0
+        print(f"[Digest Error] {e}")
+        ok = False
+    for alert_id, _ in alerts:
+        if ok:
+            await asyncio.to_thread(queue.ack, alert_id)
+        else:
+            await release_alert(queue, alert_id)
 
-# ------------------------------------------------------------------------------
-# Monitoring: Continuously Poll DexScreener
-# ------------------------------------------------------------------------------
-async def monitor_new_pairs(app, chat_id: int, context: ContextTypes.DEFAULT_TYPE):
+async def deliver_alerts(bot: Bot, queue: AlertQueue, heartbeat=lambda: None):
     """
-    Continuously poll DexScreener for new tokens.
-    Store each new token uniquely (in memory and JSON file).
-    Send the token if it matches the current filters.
+    Claim queued alerts and send them to the chain's channel, or else to every
+    subscribed chat whose filters the token passes (checked at delivery time).
+    Destinations in digest_destinations collect alerts and get one digest per
+    window (or per max_tokens alerts) instead.
+    An alert is only acknowledged once every recipient got it; on failure it is
+    released back to the queue and retried later for the recipients it missed,
+    until it failed too often. Finished alerts past ALERT_RETENTION_DAYS are
+    pruned once an hour.
     """
-    seen_addresses = set()
+    next_digest_check = next_prune = 0.0
     while True:
+        heartbeat()
+        if time.monotonic() >= next_digest_check:
+            next_digest_check = time.monotonic() + 1
+            await send_due_digests(bot, queue)
+        if time.monotonic() >= next_prune:
+            next_prune = time.monotonic() + 3600
+            await asyncio.to_thread(queue.prune)
+
+        claimed = await asyncio.to_thread(queue.claim, WORKER_NAME)
+        if claimed is None:
+            await asyncio.sleep(1)
+            continue
+
+        alert_id, token = claimed
         try:
-            resp = await asyncio.to_thread(requests.get, TOKEN_PROFILES_URL, timeout=10)
-            resp.raise_for_status()
-            profiles = resp.json()
-
-            for p in profiles:
-                token_addr = p.get("tokenAddress", "")
-                if not token_addr or token_addr in seen_addresses:
-                    continue
-
-                seen_addresses.add(token_addr)
-                chain_id = p.get("chainId", "").lower()  # Ensure lowercase for consistency
-                links = p.get("links", [])
-
-                website_url  = None
-                twitter_url  = None
-                telegram_url = None
-
-                for link in links:
-                    link_type  = link.get("type", "").lower()
-                    link_label = link.get("label", "").lower()
-                    url        = link.get("url", "")
-                    if "website" in link_type or "website" in link_label:
-                        website_url = url
-                    elif "twitter" in link_type or "twitter" in link_label:
-                        twitter_url = url
-                    elif "telegram" in link_type or "telegram" in link_label:
-                        telegram_url = url
-
-                telegram_members = await get_telegram_member_count(telegram_url)
-                followers = await asyncio.to_thread(get_twitter_followers, twitter_url) if twitter_url else 0
-
-                token_data = {
-                    "chain_id": chain_id,
-                    "token_address": token_addr,
-                    "followers": followers,
-                    "telegram_url": telegram_url or "N/A",
-                    "telegram_members": telegram_members,
-                    "twitter_url": twitter_url or "N/A",
-                    "website_url": website_url or "N/A"
-                }
-
-                # Store token in memory and append to JSON file if new
-                if "all_tokens" not in context.chat_data:
-                    context.chat_data["all_tokens"] = []
-                context.chat_data["all_tokens"].append(token_data)
-                append_token_to_file(token_data)
-
-                # Check filters (if any)
-                cfilter = context.chat_data.get("chain_filter", None)
-                ffilter = context.chat_data.get("follower_filter", 0)
-
-                if cfilter and chain_id != cfilter:
-                    continue
-                if ffilter > 0 and followers < ffilter:
-                    continue
-
-                # Mapping from normalized chain names to Telegram channel links
-                chain_channels = {
-                    "hbar": "https://t.me/+-GNRIXL75FdlMzA0",
-                    "bera": "https://t.me/+-nNZ7GRsDD8yOTRk",
-                    "base": "https://t.me/+Z7bIbiZSvmw2MDg0",
-                    "ink": "https://t.me/+bgkM-tOrCvBmNjk0",
-                    "xrp": "https://t.me/+JQ4yRr7UWxtiOTFk",
-                    "sui": "https://t.me/+qHwlrzvNvNJlZDI0"
-                }
-
-                # In your monitor_new_pairs function, after constructing your message:
-                dex_link = f"https://dexscreener.com/{chain_id.lower()}/{token_addr.lower()}"
-                divider = "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-                msg = (
-                    "<b>🚀 NEW TOKEN ALERT 🚀</b>" + divider +
-                    f"<b>Chain:</b> <code>{chain_id}</code>\n"
-                    f"<b>Token Address:</b> <code>{token_addr}</code>\n"
-                    f"<b>Website:</b> {website_url if website_url else '<i>N/A</i>'}\n"
-                    f"<b>Telegram:</b> " +
-                    (f"<a href='{telegram_url}'>{telegram_url}</a>" if telegram_url and telegram_url != "N/A" else "<i>N/A</i>") +
-                    f" (<code>{telegram_members}</code> Members)\n"
-                    f"<b>Twitter:</b> " +
-                    (f"<a href='{twitter_url}'>{twitter_url}</a>" if twitter_url and twitter_url != "N/A" else "<i>N/A</i>") +
-                    f" (<code>{followers}</code> Followers)\n"
-                    f"<b>Dexscreener:</b> <a href='{dex_link}'>{dex_link}</a>" +
-                    divider +
-                    "<i>Stay updated with the latest tokens!</i>"
-                )
-
-                # Normalize chain_id (assume token chain is stored in lowercase)
-                normalized_chain = chain_id.strip().lower()
-
-                # Check if this chain has a dedicated channel
-                if normalized_chain in chain_channels:
-                    target_channel = chain_channels[normalized_chain]
-                    await app.bot.send_message(chat_id=target_channel, text=msg, parse_mode="HTML")
-                else:
-                    # If the chain is not one of the special ones, send to a default chat (or skip)
-                    await app.bot.send_message(chat_id=chat_id, text=msg, parse_mode="HTML")
-
-
-
-
-
-            await asyncio.sleep(2)
-        except requests.exceptions.RequestException as e:
-            print(f"[Request Error] {e}")
-            await asyncio.sleep(2)
+            # Normalize chain_id (assume token chain is stored in lowercase)
+            normalized_chain = token["chain_id"].strip().lower()
+
+            # Chains with a dedicated channel go there, everything else to the chats
+            destination = normalized_chain if normalized_chain in chain_channels else "default"
+            if destination in digest_destinations:
+                await asyncio.to_thread(queue.batch, alert_id, destination)
+                continue
+            recipients = await asyncio.to_thread(get_recipients, destination)
+            if await send_alerts(bot, queue, [(alert_id, token)], recipients, render_alert):
+                await asyncio.to_thread(queue.ack, alert_id)
+            else:
+                await release_alert(queue, alert_id)
         except Exception as e:
-            print(f"[Unexpected Error] {e}")
+            print(f"[Delivery Error] {e}")
+            await release_alert(queue, alert_id)
             await asyncio.sleep(3)
 
+async def details_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    "details" button of a digest -> reply with the token's full alert.
+    """
+    query = update.callback_query
+    seq = int(query.data.split(":", 1)[1])
+    token = await asyncio.to_thread(load_token, seq)
+    if token is None:
+        await query.answer("This token is no longer in the history.")
+        return
+    await query.answer()
+    await query.message.reply_text(format_alert(token), parse_mode="HTML")
+
 # ------------------------------------------------------------------------------
 # Filtering Helpers
 # ------------------------------------------------------------------------------
@@ -248,25 +436,60 @@ def apply_filter_to_tokens(tokens, chain_filter=None, follower_filter=0):
     if chain_filter:
         result = [t for t in result if t["chain_id"] == chain_filter]
     if follower_filter > 0:
-        result = [t for t in result if t["followers"] >= follower_filter]
+        # Unknown or pending follower counts do not pass a follower filter
+        result = [t for t in result if (t["followers"] or 0) >= follower_filter]
     return result
 
 async def resend_filtered_tokens(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Load tokens from the JSON file, apply the current filters,
-    and re-send only tokens that have not been re-sent previously.
+    Load tokens stored after this chat's cursor, apply the current filters,
+    and send them. The cursor then moves past every token that was checked,
+    so the next request only shows what is new since this one.
+    Tokens stored without follower counts are only enriched when the follower
+    filter needs them, at most ON_DEMAND_LIMIT per request; the cursor then
+    stops at the last one enriched and the next request continues from there.
+    That enrichment can take a while, so it runs as a background task (one
+    per chat) and the chat gets a progress reply instead of holding up other
+    updates. Without a follower filter such tokens show "not checked".
     """
-    all_tokens = load_tokens_from_file()
-    cfilter = context.chat_data.get("chain_filter", None)
-    ffilter = context.chat_data.get("follower_filter", 0)
-
-    matched = apply_filter_to_tokens(all_tokens, cfilter, ffilter)
+    task = context.chat_data.get("resend_task")
+    if task is not None and not task.done():
+        await update.message.reply_text("Still checking stored tokens; the results will follow.")
+        return
 
-    # Use a set to track already-sent tokens in filtering
-    if "sent_filtered" not in context.chat_data:
-        context.chat_data["sent_filtered"] = set()
+    chat_id = update.effective_chat.id
+    state = await asyncio.to_thread(load_chat_state, chat_id)
+    new_tokens_all = await asyncio.to_thread(load_tokens_after, state["cursor"])
+
+    candidates = apply_filter_to_tokens(new_tokens_all, state["chain_filter"])
+    pending = []
+    more_pending = False
+    if state["follower_filter"] > 0:
+        pending = [t for t in candidates if not t.get("enriched", True)]
+        if len(pending) > ON_DEMAND_LIMIT:
+            last_seq = pending[ON_DEMAND_LIMIT - 1]["seq"]
+            new_tokens_all = [t for t in new_tokens_all if t["seq"] <= last_seq]
+            candidates = [t for t in candidates if t["seq"] <= last_seq]
+            pending = pending[:ON_DEMAND_LIMIT]
+            more_pending = True
+
+    resend = send_filtered_tokens(update, state, new_tokens_all, candidates, more_pending)
+    if not pending:
+        await resend
+        return
+    await update.message.reply_text(f"Checking followers of {len(pending)} stored tokens, this can take a minute...")
+    context.chat_data["resend_task"] = context.application.create_task(resend, update=update)
 
-    new_tokens = [t for t in matched if t["token_address"] not in context.chat_data["sent_filtered"]]
+async def send_filtered_tokens(update: Update, state: dict, new_tokens_all: list, candidates: list,
+                               more_pending: bool):
+    """
+    Second half of resend_filtered_tokens: enrich the candidates that need it,
+    send the ones passing the follower filter and move the chat's cursor.
+    """
+    chat_id = update.effective_chat.id
+    if state["follower_filter"] > 0:
+        await enrich_on_demand(candidates)
+    new_tokens = apply_filter_to_tokens(candidates, follower_filter=state["follower_filter"])
 
     if not new_tokens:
         await update.message.reply_text("No new tokens match the current filter.")
@@ -275,24 +498,23 @@ async def resend_filtered_tokens(update: Update, context: ContextTypes.DEFAULT_T
         divider = "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
 
         for t in new_tokens:
-            # Build Dexscreener link based on chain and token address
-            dex_link = f"https://dexscreener.com/{t['chain_id'].lower()}/{t['token_address']}"
-
             msg = (
                 f"<b>🔍 FILTERED TOKEN</b>{divider}"
-                f"<b>Chain:</b> <code>{t['chain_id']}</code>\n"
-                f"<b>Token Address:</b> <code>{t['token_address']}</code>\n"
-                f"<b>Website:</b> {t['website_url'] if t['website_url'] != 'N/A' else '<i>N/A</i>'}\n"
-                f"<b>Telegram:</b> " +
-                    (f"<a href='{t['telegram_url']}'>{t['telegram_url']}</a>" if t['telegram_url'] != 'N/A' else "<i>N/A</i>") +
-                f" ({t['telegram_members']} Members)\n"
-                f"<b>Twitter:</b> " +
-                    (f"<a href='{t['twitter_url']}'>{t['twitter_url']}</a>" if t['twitter_url'] != 'N/A' else "<i>N/A</i>") +
-                f" ({t['followers']} Followers)\n"
-                f"<b>Dexscreener:</b> <a href='{dex_link}'>{dex_link}</a>"
+                f"<b>Chain:</b> <code>{html.escape(t['chain_id'])}</code>\n"
+                f"<b>Token Address:</b> <code>{html.escape(t['token_address'])}</code>\n"
+                f"<b>Website:</b> {html_text(t['website_url'])}\n"
+                f"<b>Telegram:</b> {html_link(t['telegram_url'])}"
+                f" ({display_count(t, 'telegram_members')} Members)\n"
+                f"<b>Twitter:</b> {html_link(t['twitter_url'])}"
+                f" ({display_count(t, 'followers')} Followers)\n"
+                f"<b>Dexscreener:</b> {dexscreener_link(t)}"
             )
             await update.message.reply_text(msg, parse_mode="HTML")
-            context.chat_data["sent_filtered"].add(t["token_address"])
+
+    if more_pending:
+        await update.message.reply_text("More stored tokens still need checking; press Show Current Filtered again.")
+    if new_tokens_all:
+        await asyncio.to_thread(update_chat_state, chat_id, cursor=new_tokens_all[-1]["seq"])
 
 
 # ------------------------------------------------------------------------------
@@ -300,14 +522,14 @@ async def resend_filtered_tokens(update: Update, context: ContextTypes.DEFAULT_T
 # ------------------------------------------------------------------------------
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    /start -> Initialize filters and start background monitoring.
+    /start -> Initialize filters and subscribe the chat to live alerts.
+    Monitoring itself runs in the background from startup (see on_startup).
     """
     chat_id = update.effective_chat.id
 
-    context.chat_data["chain_filter"] = None
-    context.chat_data["follower_filter"] = 0
-    context.chat_data["all_tokens"] = []
-    context.chat_data["sent_filtered"] = set()
+    await asyncio.to_thread(
+        update_chat_state, chat_id, chain_filter=None, follower_filter=0, cursor=0, subscribed=True
+    )
     start_msg = (
     "<b>🚀 Welcome to New Pairs Bot! 🚀</b>\n"
     "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
@@ -329,9 +551,6 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=ReplyKeyboardRemove()
     )
 
-    # Start background monitoring as a task
-    context.application.create_task(monitor_new_pairs(context.application, chat_id, context))
-
 async def filter_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     /filter -> Show keyboard for follower filters and utilities.
@@ -371,21 +590,15 @@ async def filter_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ------------------------------------------------------------------------------
 async def filter_selection_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_text = update.message.text.strip().lower()
-
-    # Ensure defaults exist:
-    if "chain_filter" not in context.chat_data:
-        context.chat_data["chain_filter"] = None
-    if "follower_filter" not in context.chat_data:
-        context.chat_data["follower_filter"] = 0
+    chat_id = update.effective_chat.id
 
     # Check if the user is trying to set a chain filter by typing a chain name
-    # Get available chains from the JSON file (or from in-memory tokens)
-    all_tokens = load_tokens_from_file()  # from your JSON file
-    available_chains = { token["chain_id"].strip().lower() for token in all_tokens }
+    # Get available chains from the token archive's manifest
+    available_chains = {chain.strip().lower() for chain in await asyncio.to_thread(load_known_chains)}
 
     # If the user text matches one of the available chains, set the filter
     if user_text in available_chains:
-        context.chat_data["chain_filter"] = user_text  # store the normalized chain name
+        await asyncio.to_thread(update_chat_state, chat_id, chain_filter=user_text)  # normalized chain name
         await update.message.reply_text(f"Chain filter set to {user_text.upper()}.")
         return
 
@@ -407,14 +620,13 @@ async def filter_selection_handler(update: Update, context: ContextTypes.DEFAULT
     if user_text.startswith("followers >"):
         try:
             threshold = int(user_text.split(">")[1].strip())
-            context.chat_data["follower_filter"] = threshold
+            await asyncio.to_thread(update_chat_state, chat_id, follower_filter=threshold)
             await update.message.reply_text(f"Twitter follower filter set to > {threshold}.")
         except ValueError:
             await update.message.reply_text("Could not parse follower filter. Try again.")
     elif user_text == "clear filters":
-        context.chat_data["chain_filter"] = None
-        context.chat_data["follower_filter"] = 0
-        context.chat_data["sent_filtered"] = set()  # Reset filtered output tracker
+        # Also rewind the cursor so "Show Current Filtered" starts from the beginning
+        await asyncio.to_thread(update_chat_state, chat_id, chain_filter=None, follower_filter=0, cursor=0)
         await update.message.reply_text("All filters cleared.")
     elif user_text == "show current filtered":
         await resend_filtered_tokens(update, context)
@@ -426,16 +638,71 @@ async def filter_selection_handler(update: Update, context: ContextTypes.DEFAULT
 # ------------------------------------------------------------------------------
 # Main
 # ------------------------------------------------------------------------------
+# Owns the background loops of this process and restarts them if they stall
+supervisor = Supervisor(stats={"enrichment": lambda: dict(enrich_stats)})
+
+def supervise_ingest():
+    """Run the ingest loop under the supervisor and report its enrichment backlog."""
+    monitor = build_ingest_monitor()
+    supervisor.stats["ingest"] = monitor.status
+    supervisor.add("ingest", monitor.run)
+
+async def on_startup(app):
+    """
+    Launch the background tasks this process is responsible for.
+    """
+    if RUN_MODE == "all":
+        await start_telethon()
+        supervise_ingest()
+    supervisor.add("deliver", lambda beat: deliver_alerts(app.bot, alert_queue, beat))
+    # Not app.create_task: the application waits for those on stop, and this never ends
+    app.bot_data["supervisor_task"] = asyncio.create_task(supervisor.run())
+
+async def on_shutdown(app):
+    """
+    Stop the background tasks together with the bot.
+    """
+    task = app.bot_data.get("supervisor_task")
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+async def run_ingest():
+    await start_telethon()
+    supervise_ingest()
+    await supervisor.run()
+
+async def run_deliver():
+    async with Bot(BOT_TOKEN) as bot:
+        supervisor.add("deliver", lambda beat: deliver_alerts(bot, alert_queue, beat))
+        await supervisor.run()
+
 def main():
-    import os
-    token = "8141585234:AAF7SpJPDpvmQGmkRmhUhxCIpxNs0soQQYI"
+    if RUN_MODE not in RUN_MODES:
+        raise SystemExit(f"Unknown run mode '{RUN_MODE}'. Choose one of: {', '.join(RUN_MODES)}")
 
-    app = ApplicationBuilder().token(token).build()
+    if RUN_MODE == "ingest":
+        print("Ingestion worker is running...")
+        asyncio.run(run_ingest())
+        return
+    if RUN_MODE == "deliver":
+        print(f"Delivery worker {WORKER_NAME} is running...")
+        asyncio.run(run_deliver())
+        return
+
+    builder = ApplicationBuilder().token(BOT_TOKEN).post_init(on_startup).post_stop(on_shutdown)
+    if WEBHOOK_PORT:
+        builder = builder.concurrent_updates(WEBHOOK_CONCURRENCY)
+    app = builder.build()
 
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("filter", filter_command))
+    app.add_handler(CallbackQueryHandler(details_callback, pattern=r"^details:\d+$"))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, filter_selection_handler))
 
+    if WEBHOOK_PORT:
+        run_webhook(app)
+        return
     print("Bot is running...")
     app.run_polling()
 
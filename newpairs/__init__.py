@@ -0,0 +1,38 @@
+"""
+Shared async core for the New Pairs monitors.
+
+script.py, v1_script.py, bot.py and chain.py are thin frontends over this
+package: they pick a set of sinks and run a Monitor.
+"""
+from .alert_queue import AlertQueue
+from .enrich import (
+    display_count,
+    enrich_stats,
+    enrich_token,
+    load_social_history,
+    start_telethon,
+    stop_telethon,
+)
+from .feed_diff import FeedDiffer
+from .pipeline import Monitor
+from .sinks import ConsoleSink, JsonlSink, QueueSink, StoreSink, TelegramSink, WebhookSink
+from .supervisor import Supervisor
+
+__all__ = [
+    "AlertQueue",
+    "ConsoleSink",
+    "FeedDiffer",
+    "JsonlSink",
+    "Monitor",
+    "QueueSink",
+    "StoreSink",
+    "Supervisor",
+    "TelegramSink",
+    "WebhookSink",
+    "display_count",
+    "enrich_stats",
+    "enrich_token",
+    "load_social_history",
+    "start_telethon",
+    "stop_telethon",
+]
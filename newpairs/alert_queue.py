@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+# ------------------------------------------------------------------------------
+# Durable Alert Queue
+# ------------------------------------------------------------------------------
+# A small SQLite-backed queue that connects the ingestion process (DexScreener
+# polling + Telethon/Nitter enrichment) with one or more delivery processes
+# (Telegram senders). Each side can be restarted independently:
+#   * token_address is UNIQUE, so re-ingesting a token never queues it twice.
+#   * delivery workers claim an alert with a lease; an alert is only marked as
+#     sent after Telegram accepted it, and a crashed worker's lease expires so
+#     another worker picks the alert up again.
+#   * an alert can go to several chats; when only some of them got it, those
+#     are recorded and the retry only goes to the others. A crash between a
+#     send and ack() resends it, so delivery is at-least-once.
+#   * a failed send is retried with exponential backoff, so one bad alert does
+#     not hold up the ones behind it; after MAX_ATTEMPTS failures it is moved
+#     to the "failed" state and kept for inspection.
+#   * alerts for digest destinations are parked in the "batched" state; the
+#     batch is claimed as a whole once it is due, so with any number of
+#     delivery workers each batch becomes exactly one digest.
+#   * finished alerts (sent/skipped) only keep their token_address, which
+#     contains() needs; the token itself lives in the token archive. Finished
+#     and failed alerts older than RETENTION_DAYS are deleted by prune(), after
+#     which a token reappearing in the feed would be treated as new.
+# ------------------------------------------------------------------------------
+QUEUE_PATH = os.getenv("ALERT_QUEUE_PATH", "alerts.db")
+MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "5"))
+RETRY_DELAY = 5          # Seconds before the first retry, doubled on each failure
+MAX_RETRY_DELAY = 300
+RETENTION_DAYS = float(os.getenv("ALERT_RETENTION_DAYS", "30"))
+
+PENDING = "pending"
+CLAIMED = "claimed"
+SENT = "sent"
+FAILED = "failed"
+SKIPPED = "skipped"      # Recorded so restarts know the token, never delivered
+BATCHED = "batched"      # Waiting in a digest batch for its destination
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    token_address TEXT NOT NULL UNIQUE,
+    payload       TEXT NOT NULL,
+    state         TEXT NOT NULL DEFAULT 'pending',
+    claimed_by    TEXT,
+    lease_until   REAL,
+    created_at    REAL NOT NULL,
+    sent_at       REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    not_before    REAL NOT NULL DEFAULT 0,
+    destination   TEXT,
+    batched_at    REAL,
+    delivered_to  TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_state ON alerts (state, id);
+"""
+
+# Columns added after the first release, for queues created before them
+MIGRATIONS = {
+    "attempts": "ALTER TABLE alerts ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    "not_before": "ALTER TABLE alerts ADD COLUMN not_before REAL NOT NULL DEFAULT 0",
+    "destination": "ALTER TABLE alerts ADD COLUMN destination TEXT",
+    "batched_at": "ALTER TABLE alerts ADD COLUMN batched_at REAL",
+    "delivered_to": "ALTER TABLE alerts ADD COLUMN delivered_to TEXT",
+}
+
+
+class AlertQueue:
+    """
+    All methods are blocking; call them via asyncio.to_thread from the bot.
+    A fresh connection is opened per call so the queue can be shared between
+    threads and processes without any extra locking.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH, lease_seconds: float = 60):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(alerts)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    # --------------------------------------------------------------------------
+    # Producer side
+    # --------------------------------------------------------------------------
+    def put(self, token: dict, deliver: bool = True) -> bool:
+        """
+        Queue a token alert. With deliver=False the token is only recorded (so
+        contains() knows it) and never claimed. Returns False if the token was
+        already queued.
+        """
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO alerts (token_address, payload, state, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (token["token_address"], json.dumps(token) if deliver else "{}",
+                 PENDING if deliver else SKIPPED, time.time()),
+            )
+            return cur.rowcount == 1
+
+    def contains(self, token_address: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM alerts WHERE token_address = ?", (token_address,)
+            ).fetchone()
+            return row is not None
+
+    # --------------------------------------------------------------------------
+    # Consumer side
+    # --------------------------------------------------------------------------
+    def claim(self, worker: str):
+        """
+        Claim the oldest deliverable alert for `worker`.
+        Returns (alert_id, token_dict) or None if nothing is waiting.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, payload FROM alerts "
+                "WHERE (state = ? AND not_before <= ?) OR (state = ? AND lease_until < ?) "
+                "ORDER BY id LIMIT 1",
+                (PENDING, now, CLAIMED, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE alerts SET state = ?, claimed_by = ?, lease_until = ? WHERE id = ?",
+                (CLAIMED, worker, now + self.lease_seconds, row[0]),
+            )
+            conn.execute("COMMIT")
+            return row[0], json.loads(row[1])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def ack(self, alert_id: int):
+        """Mark an alert as delivered, dropping its payload."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE alerts SET state = ?, sent_at = ?, lease_until = NULL, "
+                "payload = '{}', delivered_to = NULL WHERE id = ?",
+                (SENT, time.time(), alert_id),
+            )
+
+    def batch(self, alert_id: int, destination: str):
+        """Park a claimed alert in the digest batch of `destination`."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE alerts SET state = ?, destination = ?, batched_at = ?, "
+                "claimed_by = NULL, lease_until = NULL WHERE id = ? AND state = ?",
+                (BATCHED, destination, time.time(), alert_id, CLAIMED),
+            )
+
+    def claim_batch(self, destination: str, worker: str, window: float, max_tokens: int) -> list:
+        """
+        Claim the digest batch of `destination` if it is due: it holds
+        max_tokens alerts, or its oldest alert has waited `window` seconds.
+        Returns [(alert_id, token_dict), ...], empty if nothing is due.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, payload, batched_at FROM alerts WHERE state = ? AND destination = ? "
+                "ORDER BY id LIMIT ?",
+                (BATCHED, destination, max_tokens),
+            ).fetchall()
+            if not rows or (len(rows) < max_tokens and now - min(r[2] for r in rows) < window):
+                conn.execute("COMMIT")
+                return []
+            conn.executemany(
+                "UPDATE alerts SET state = ?, claimed_by = ?, lease_until = ? WHERE id = ?",
+                [(CLAIMED, worker, now + self.lease_seconds, r[0]) for r in rows],
+            )
+            conn.execute("COMMIT")
+            return [(r[0], json.loads(r[1])) for r in rows]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def delivered_to(self, alert_ids: list) -> dict:
+        """Recipients each alert already reached on earlier attempts, {alert_id: set}."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT id, delivered_to FROM alerts WHERE id IN ({','.join('?' * len(alert_ids))})",
+                alert_ids,
+            ).fetchall()
+        delivered = {alert_id: set() for alert_id in alert_ids}
+        for alert_id, targets in rows:
+            delivered[alert_id] = set(json.loads(targets or "[]"))
+        return delivered
+
+    def mark_delivered(self, alert_ids: list, target: str):
+        """Record that `target` received these alerts, so a retry skips it."""
+        delivered = self.delivered_to(alert_ids)
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "UPDATE alerts SET delivered_to = ? WHERE id = ?",
+                [(json.dumps(sorted(delivered[alert_id] | {target})), alert_id) for alert_id in alert_ids],
+            )
+
+    def batched_destinations(self) -> list:
+        """Destinations that have alerts waiting in a digest batch."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT DISTINCT destination FROM alerts WHERE state = ?", (BATCHED,))
+            return [row[0] for row in rows]
+
+    def release(self, alert_id: int) -> bool:
+        """
+        Return a claimed alert to the queue after a failed send, to be retried
+        after a backoff. Returns True if it failed too often and was given up.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT attempts FROM alerts WHERE id = ?", (alert_id,)).fetchone()
+            if row is None:
+                return False
+            attempts = row[0] + 1
+            failed = attempts >= MAX_ATTEMPTS
+            delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+            conn.execute(
+                "UPDATE alerts SET state = ?, attempts = ?, not_before = ?, "
+                "claimed_by = NULL, lease_until = NULL WHERE id = ?",
+                (FAILED if failed else PENDING, attempts, time.time() + delay, alert_id),
+            )
+            return failed
+
+    # --------------------------------------------------------------------------
+    # Housekeeping
+    # --------------------------------------------------------------------------
+    def prune(self, older_than_days: float = RETENTION_DAYS) -> int:
+        """Delete sent, skipped and failed alerts older than the given age; returns how many."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "DELETE FROM alerts WHERE state IN (?, ?, ?) AND COALESCE(sent_at, created_at) < ?",
+                (SENT, SKIPPED, FAILED, time.time() - older_than_days * 86400),
+            )
+            return cur.rowcount
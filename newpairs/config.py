@@ -0,0 +1,50 @@
+import os
+
+from dotenv import load_dotenv
+
+# ------------------------------------------------------------------------------
+# Shared Configuration
+# ------------------------------------------------------------------------------
+load_dotenv()
+
+# Telegram API credentials (for Telethon member counts)
+API_ID = int(os.getenv("API_ID", "23029837"))
+API_HASH = os.getenv("API_HASH", "2cd4f5ead73424ff9a02da5f66de76eb")
+SESSION_PATH = os.getenv("SESSION_PATH", "session_name")  # Name of your pre-saved session file
+
+# Nitter instance for Twitter stats
+# ⚠️ Try changing the instance URL if you experience rate limiting.
+NITTER_INSTANCE = os.getenv("NITTER_INSTANCE", "https://nitter.privacydev.net")
+
+# DexScreener endpoint (overridable to point at a local stand-in, see soak.py)
+TOKEN_PROFILES_URL = os.getenv("TOKEN_PROFILES_URL", "https://api.dexscreener.com/token-profiles/latest/v1")
+
+# How many new tokens are enriched at the same time
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "5"))
+
+# Enrichment time budget per token, and per source within it (seconds).
+# Lookups still running at the deadline finish in the background.
+ENRICH_DEADLINE = float(os.getenv("ENRICH_DEADLINE", "8"))
+TWITTER_TIMEOUT = float(os.getenv("TWITTER_TIMEOUT", "30"))
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "20"))
+
+# Threads for the blocking Nitter lookups (kept apart from the default executor)
+NITTER_THREADS = int(os.getenv("NITTER_THREADS", "4"))
+
+# How long a Twitter/Telegram lookup result is reused for other tokens
+# sharing the same handle or group
+SOCIAL_REUSE_TTL = int(os.getenv("SOCIAL_REUSE_TTL", "1800"))
+
+# How long a failed lookup is remembered before the handle or group is tried again
+FAILED_LOOKUP_TTL = int(os.getenv("FAILED_LOOKUP_TTL", "120"))
+
+# How many days of token history seed the social-link index at startup
+SOCIAL_HISTORY_DAYS = int(os.getenv("SOCIAL_HISTORY_DAYS", "30"))
+
+# Webhook mode for the Telegram frontends (long polling is used when WEBHOOK_PORT is unset)
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "0")) or None
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")          # Public URL registered with Telegram (optional)
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "16"))  # Updates handled at once
@@ -0,0 +1,369 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from ntscraper import Nitter
+from telethon import TelegramClient
+from telethon.tl.functions.channels import GetFullChannelRequest
+from telethon.errors import ChannelInvalidError, ChannelPrivateError, UsernameNotOccupiedError
+
+from .config import (
+    API_HASH,
+    API_ID,
+    ENRICH_DEADLINE,
+    FAILED_LOOKUP_TTL,
+    NITTER_INSTANCE,
+    NITTER_THREADS,
+    SESSION_PATH,
+    SOCIAL_HISTORY_DAYS,
+    SOCIAL_REUSE_TTL,
+    TELEGRAM_TIMEOUT,
+    TWITTER_TIMEOUT,
+)
+from .social_index import SocialIndex, normalize_domain, normalize_handle
+
+# ------------------------------------------------------------------------------
+# Clients (created on first use, so frontends that never enrich need neither)
+# ------------------------------------------------------------------------------
+_telethon_client = None
+_nitter_client = None
+
+def get_telethon_client() -> TelegramClient:
+    global _telethon_client
+    if _telethon_client is None:
+        _telethon_client = TelegramClient(SESSION_PATH, API_ID, API_HASH)
+    return _telethon_client
+
+def get_nitter_client() -> Nitter:
+    global _nitter_client
+    if _nitter_client is None:
+        _nitter_client = Nitter(NITTER_INSTANCE)
+    return _nitter_client
+
+async def start_telethon():
+    await get_telethon_client().start()
+    print("Telethon client started successfully!")
+
+async def stop_telethon():
+    if _telethon_client is not None:
+        await _telethon_client.disconnect()
+        print("Telethon client disconnected.")
+
+# ------------------------------------------------------------------------------
+# Social-Link Reuse
+# ------------------------------------------------------------------------------
+# Lookup results are reused for SOCIAL_REUSE_TTL seconds across tokens sharing
+# the same Twitter handle or Telegram group, failures for FAILED_LOOKUP_TTL.
+social_index = SocialIndex(SOCIAL_REUSE_TTL, forget_after=SOCIAL_HISTORY_DAYS * 86400,
+                           failure_ttl=FAILED_LOOKUP_TTL)
+
+# Lookups running right now, (kind, key) -> task; tokens launched together
+# with the same handle or group wait for one lookup instead of starting their own
+_in_flight = {}
+
+async def shared_lookup(kind: str, key: str, fetch, timeout: float):
+    """
+    Return the count for a social link: a recent result from the index, None
+    if its last lookup failed recently, or else the result of `await fetch()`
+    (bounded by `timeout`), which concurrent callers for the same link share.
+    """
+    cached = social_index.lookup(kind, key)
+    if cached is not None:
+        return cached
+    if social_index.failed_recently(kind, key):
+        return None
+    task = _in_flight.get((kind, key))
+    if task is None:
+        task = asyncio.ensure_future(asyncio.wait_for(fetch(), timeout))
+        _in_flight[(kind, key)] = task
+
+        def done(task):
+            _in_flight.pop((kind, key), None)
+            # Every caller may have given up already; a timeout is not worth a traceback
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+    # One caller giving up (its token's deadline) must not cancel the others' lookup
+    return await asyncio.shield(task)
+
+# ------------------------------------------------------------------------------
+# Helper Functions for Data Extraction
+# ------------------------------------------------------------------------------
+def extract_links(links: list):
+    """Return (website_url, twitter_url, telegram_url) from a profile's links."""
+    website_url  = None
+    twitter_url  = None
+    telegram_url = None
+
+    for link in links:
+        link_type  = link.get("type", "").lower()
+        link_label = link.get("label", "").lower()
+        url        = link.get("url", "")
+        if "website" in link_type or "website" in link_label:
+            website_url = url
+        elif "twitter" in link_type or "twitter" in link_label:
+            twitter_url = url
+        elif "telegram" in link_type or "telegram" in link_label:
+            telegram_url = url
+
+    return website_url, twitter_url, telegram_url
+
+# First path segments of x.com / t.me links that are not an account
+TWITTER_NON_PROFILE = {"i", "intent", "home", "search", "hashtag", "explore", "share", "messages", "settings"}
+TELEGRAM_NON_PROFILE = {"joinchat", "c", "addlist", "share", "proxy", "socks"}
+
+def _url_segments(url: str, hosts: tuple) -> list:
+    """Path segments of an http(s) URL on one of `hosts` (query/fragment dropped), else []."""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().split(":")[0]
+    for prefix in ("www.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if parsed.scheme not in ("http", "https") or host not in hosts:
+        return []
+    return [segment for segment in parsed.path.split("/") if segment]
+
+def parse_twitter_handle(twitter_url: str) -> str:
+    """
+    Extract the Twitter handle from a given URL.
+    For example: "https://twitter.com/example/status/123?s=21" returns "example".
+    Links that are not a profile (communities, Grok shares, ...) return None.
+    """
+    if not twitter_url:
+        return None
+    segments = _url_segments(twitter_url, ("x.com", "twitter.com"))
+    if not segments or segments[0].lower() in TWITTER_NON_PROFILE:
+        return None
+    return segments[0]
+
+def parse_telegram_username(telegram_url: str) -> str:
+    """
+    Extract the public username from a t.me link; "t.me/s/<name>" is the web
+    preview of the same channel. Invite and private links have no username
+    and return None.
+    """
+    if not telegram_url:
+        return None
+    segments = _url_segments(telegram_url, ("t.me", "telegram.me"))
+    if segments[:1] == ["s"]:
+        segments = segments[1:]
+    if not segments or segments[0].startswith("+") or segments[0].lower() in TELEGRAM_NON_PROFILE:
+        return None
+    return segments[0]
+
+def get_twitter_followers(twitter_url: str) -> int:
+    """
+    Retrieve the Twitter follower count using Nitter, or None if unknown.
+    This function is blocking; enrichment runs it on the Nitter pool.
+    """
+    handle = parse_twitter_handle(twitter_url)
+    if not handle:
+        return None
+    cached = social_index.lookup("twitter", normalize_handle(handle))
+    if cached is not None:
+        return cached
+    try:
+        # Ensure a trailing slash for consistency
+        profile = get_nitter_client().get_profile_info(handle + "/")
+        if profile and 'stats' in profile:
+            followers = profile['stats'].get('followers', 0)
+            social_index.record_result("twitter", normalize_handle(handle), followers)
+            return followers
+    except Exception as e:
+        print(f"[Nitter Error] {e}")
+    social_index.record_failure("twitter", normalize_handle(handle))
+    return None
+
+# ntscraper blocks and retries with long sleeps, and a thread cannot be
+# cancelled when its lookup times out. Nitter therefore gets its own small
+# pool, so a degraded instance cannot fill the default executor that queue and
+# store calls use; while every Nitter thread is busy, lookups are skipped.
+_nitter_pool = ThreadPoolExecutor(max_workers=NITTER_THREADS, thread_name_prefix="nitter")
+_nitter_slots = threading.BoundedSemaphore(NITTER_THREADS)
+
+async def lookup_twitter_followers(twitter_url: str) -> int:
+    """
+    get_twitter_followers on the Nitter pool, one lookup per handle at a time;
+    None (unknown) if the pool is full.
+    """
+    handle = parse_twitter_handle(twitter_url)
+    if not handle:
+        return None
+
+    async def fetch():
+        if not _nitter_slots.acquire(blocking=False):
+            enrich_stats["twitter_skipped"] += 1
+            return None
+        future = _nitter_pool.submit(get_twitter_followers, twitter_url)
+        future.add_done_callback(lambda _: _nitter_slots.release())
+        return await asyncio.wrap_future(future)
+
+    return await shared_lookup("twitter", normalize_handle(handle), fetch, TWITTER_TIMEOUT)
+
+async def get_telegram_member_count(telegram_url: str) -> int:
+    """
+    Retrieve the Telegram member count for a given Telegram channel/group URL,
+    or None if unknown. One lookup per group runs at a time (see shared_lookup).
+    """
+    username = parse_telegram_username(telegram_url)
+    if not username:
+        return None
+    return await shared_lookup("telegram", normalize_handle(username),
+                               lambda: fetch_telegram_member_count(username, telegram_url), TELEGRAM_TIMEOUT)
+
+async def fetch_telegram_member_count(username: str, telegram_url: str) -> int:
+    """Ask Telegram for the member count; uses GetFullChannelRequest for channels/supergroups."""
+    client = get_telethon_client()
+    try:
+        entity = await client.get_entity(username)
+        members = 0
+        # For channels or supergroups, request full details
+        if hasattr(entity, "broadcast") or hasattr(entity, "megagroup"):
+            full_channel = await client(GetFullChannelRequest(entity))
+            if hasattr(full_channel.full_chat, "participants_count"):
+                members = full_channel.full_chat.participants_count
+        # Fallback: if the entity itself has a participants_count attribute
+        elif hasattr(entity, "participants_count"):
+            members = entity.participants_count
+        social_index.record_result("telegram", normalize_handle(username), members)
+        return members
+    except (ChannelInvalidError, ChannelPrivateError, UsernameNotOccupiedError) as e:
+        print(f"[Telethon Error] {e} for URL: {telegram_url}")
+    except Exception as e:
+        print(f"[Unexpected Telethon Error] {e} for URL: {telegram_url}")
+    social_index.record_failure("telegram", normalize_handle(username))
+    return None
+
+def social_keys(twitter_url: str, telegram_url: str, website_url: str) -> dict:
+    """Normalized social-index keys for a token's links ("N/A" counts as missing)."""
+    return {
+        "twitter": normalize_handle(parse_twitter_handle(twitter_url)),
+        "telegram": normalize_handle(parse_telegram_username(telegram_url)),
+        "website": normalize_domain(website_url),
+    }
+
+def load_social_history(tokens: list):
+    """Rebuild the social index from stored token records (oldest first)."""
+    for token in tokens:
+        keys = social_keys(token.get("twitter_url"), token.get("telegram_url"), token.get("website_url"))
+        social_index.add_token(keys, token.get("seen_at"))
+        seen_at = token.get("seen_at")
+        if not seen_at:
+            continue
+        # A stored 0 may have been a failed lookup, so only real counts are reused
+        if token.get("followers"):
+            social_index.record_result("twitter", keys["twitter"], token["followers"], seen_at)
+        if token.get("telegram_members"):
+            social_index.record_result("telegram", keys["telegram"], token["telegram_members"], seen_at)
+
+# ------------------------------------------------------------------------------
+# Enrichment
+# ------------------------------------------------------------------------------
+def describe_profile(p: dict) -> dict:
+    """
+    Build the un-enriched token record for a DexScreener profile: links only,
+    no network calls. `social_reuse` records how many earlier tokens used the
+    same handle, group or website.
+    """
+    chain_id = p.get("chainId", "").lower()  # Ensure lowercase for consistency
+    website_url, twitter_url, telegram_url = extract_links(p.get("links", []))
+    social_reuse = social_index.add_token(social_keys(twitter_url, telegram_url, website_url))
+
+    return {
+        "chain_id": chain_id,
+        "token_address": p.get("tokenAddress", ""),
+        "description": p.get("description", ""),
+        "followers": None,
+        "telegram_url": telegram_url or "N/A",
+        "telegram_members": None,
+        "twitter_url": twitter_url or "N/A",
+        "website_url": website_url or "N/A",
+        "social_reuse": social_reuse,
+        "seen_at": int(time.time()),
+        "enriched": False,
+    }
+
+# Outcome counters per source ("twitter_on_time", "telegram_late", ...)
+enrich_stats = Counter()
+
+# Lookups still running after their token's deadline (kept referenced until done)
+_late_lookups = set()
+
+def display_count(token: dict, field: str) -> str:
+    """Render a follower/member count, which may still be pending, unknown or not looked up."""
+    if token.get(field) is not None:
+        return str(token[field])
+    if not token.get("enriched", True):
+        return "not checked"
+    return "pending" if field in token.get("pending", []) else "unknown"
+
+async def enrich_token(token: dict, telegram_lookup: bool = True, deadline: float = ENRICH_DEADLINE,
+                       on_late=None) -> dict:
+    """
+    Fill in follower and member counts of a token record (in place).
+
+    Twitter and Telegram lookups run at the same time, each bounded by its own
+    timeout, and the whole token by `deadline`. When the deadline passes the
+    token is returned with what it has: unfinished fields are None and listed
+    in token["pending"], failed ones are None (unknown). Pending lookups keep
+    running; when one finishes the token is updated, the delay is recorded in
+    token["late"], and `await on_late(token)` is called to save it.
+    """
+    sources = {}
+    if token["twitter_url"] != "N/A":
+        sources["followers"] = ("twitter", TWITTER_TIMEOUT, lookup_twitter_followers(token["twitter_url"]))
+    if token["telegram_url"] != "N/A" and telegram_lookup:
+        sources["telegram_members"] = ("telegram", TELEGRAM_TIMEOUT,
+                                       get_telegram_member_count(token["telegram_url"]))
+
+    # A missing link means 0; a link we could not look up means unknown
+    token["followers"] = 0 if token["twitter_url"] == "N/A" else None
+    token["telegram_members"] = 0 if token["telegram_url"] == "N/A" else None
+    token["pending"] = []
+
+    started = time.monotonic()
+    tasks = {
+        asyncio.create_task(asyncio.wait_for(lookup, timeout)): (field, source)
+        for field, (source, timeout, lookup) in sources.items()
+    }
+
+    def collect(task, late: bool):
+        field, source = tasks[task]
+        try:
+            token[field] = task.result()
+        except (Exception, asyncio.CancelledError):
+            token[field] = None
+        if token[field] is None:
+            enrich_stats[f"{source}_failed"] += 1
+        else:
+            enrich_stats[f"{source}_{'late' if late else 'on_time'}"] += 1
+
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in done:
+            collect(task, late=False)
+        token["pending"] = [tasks[task][0] for task in pending]
+
+        async def finish_late(task):
+            await asyncio.wait([task])
+            field = tasks[task][0]
+            collect(task, late=True)
+            token["pending"].remove(field)
+            token.setdefault("late", {})[field] = round(time.monotonic() - started - deadline, 2)
+            if on_late is not None:
+                try:
+                    await on_late(token)
+                except Exception as e:
+                    print(f"[Late Result Error] {e}")
+
+        for task in pending:
+            late_task = asyncio.create_task(finish_late(task))
+            _late_lookups.add(late_task)
+            late_task.add_done_callback(_late_lookups.discard)
+
+    token["enriched"] = True
+    return token
@@ -0,0 +1,73 @@
+import hashlib
+from collections import OrderedDict
+
+try:
+    # orjson is optional; it decodes the profiles feed several times faster.
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# ------------------------------------------------------------------------------
+# Latest-Profiles Feed Diffing
+# ------------------------------------------------------------------------------
+# DexScreener returns the newest profiles first. Between two polls the feed is
+# usually identical, or a few new items were pushed on top of the previous
+# list. FeedDiffer makes those cases cheap:
+#   * an unchanged response (same bytes) is skipped without decoding JSON;
+#   * otherwise the scan stops at the first position where the rest of the
+#     feed is exactly a run of the previous poll, since all of it was handled.
+# Items above that point that are out of order or were re-inserted on top are
+# still checked against the seen set, so nothing is processed twice or missed.
+# The seen set only remembers the latest `max_seen` addresses; the feed is far
+# shorter than that, and older tokens are deduplicated by the store/queue.
+# ------------------------------------------------------------------------------
+class FeedDiffer:
+    def __init__(self, max_seen: int = 10000):
+        self.max_seen = max_seen
+        self.seen = OrderedDict()
+        self._last_digest = None
+        self._last_order = []
+        self._pending = None
+
+    def diff(self, raw: bytes) -> list:
+        """
+        Return the profiles from a raw feed response that have not been seen yet.
+        Call commit() once they were all processed.
+        """
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        if digest == self._last_digest:
+            self._pending = None
+            return []
+
+        profiles = json_loads(raw)
+        order = [p.get("tokenAddress", "") for p in profiles]
+        self._pending = (digest, order)
+
+        last_order = self._last_order
+        last_pos = {addr: i for i, addr in enumerate(last_order)}
+        cutoff = len(order)
+        for i, addr in enumerate(order):
+            j = last_pos.get(addr)
+            if j is not None and order[i:] == last_order[j:j + len(order) - i]:
+                cutoff = i
+                break
+
+        fresh = []
+        batch = set()
+        for p, addr in zip(profiles[:cutoff], order):
+            if addr and addr not in self.seen and addr not in batch:
+                batch.add(addr)
+                fresh.append(p)
+        return fresh
+
+    def mark_seen(self, token_address: str):
+        self.seen[token_address] = None
+        self.seen.move_to_end(token_address)
+        if len(self.seen) > self.max_seen:
+            self.seen.popitem(last=False)
+
+    def commit(self):
+        """Remember the last diffed feed as fully processed."""
+        if self._pending is not None:
+            self._last_digest, self._last_order = self._pending
+            self._pending = None
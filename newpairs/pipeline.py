@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import time
+
+import requests
+
+from .config import ENRICH_CONCURRENCY, TOKEN_PROFILES_URL
+from .enrich import describe_profile, enrich_token
+from .feed_diff import FeedDiffer
+
+# ------------------------------------------------------------------------------
+# Monitoring Pipeline: Poll -> Diff -> Enrich -> Sinks
+# ------------------------------------------------------------------------------
+class Monitor:
+    """
+    Continuously poll DexScreener for new tokens, enrich every new one and
+    hand each token record to the sinks as soon as it is finished. Sinks are
+    objects with an `async emit(token)` method.
+
+    Polling only queues the new tokens; `concurrency` workers enrich and emit
+    them, so a slow batch neither delays its first alerts nor the next poll.
+
+    `is_known(token_address)` lets a frontend skip tokens handled by an
+    earlier run (e.g. already on the alert queue) without re-enriching them.
+
+    `demand(chain_id)` tells how much anyone wants a chain's tokens right now:
+    0 means no possible consumer, so the token is passed on un-enriched
+    ("enriched": False) and can be enriched on demand later; higher values
+    are enriched first, also ahead of less wanted tokens from earlier polls.
+    Without it every token is enriched in arrival order.
+
+    Each token is enriched within the ENRICH_DEADLINE budget; lookups that
+    finish later update the token and call `await on_late(token)`.
+
+    run(heartbeat) beats once per poll, but only while the workers keep up:
+    with tokens waiting and no worker finishing one since the previous poll,
+    the beat is withheld, so a supervisor restarts the Monitor when all
+    workers are stuck. status() reports the backlog and its oldest wait.
+    """
+
+    def __init__(self, sinks: list, poll_interval: float = 2, telegram_lookup: bool = True,
+                 is_known=None, demand=None, on_late=None, concurrency: int = ENRICH_CONCURRENCY):
+        self.sinks = sinks
+        self.poll_interval = poll_interval
+        self.telegram_lookup = telegram_lookup
+        self.is_known = is_known
+        self.demand = demand
+        self.on_late = on_late
+        self.concurrency = concurrency
+        self.differ = FeedDiffer()
+        self._wanted = asyncio.PriorityQueue()   # (-demand, arrival, token) waiting for enrichment
+        self._arrival = itertools.count()
+        self._queued_at = {}    # arrival -> monotonic time, oldest first
+        self._finished = 0      # Tokens the workers finished, to tell progress between polls
+
+    async def _worker(self):
+        while True:
+            item = await self._wanted.get()
+            token = item[2]
+            try:
+                await enrich_token(token, telegram_lookup=self.telegram_lookup, on_late=self.on_late)
+                await self._emit(token)
+            except asyncio.CancelledError:
+                # Keep it for the workers of the next run() (sinks ignore repeats)
+                self._wanted.put_nowait(item)
+                raise
+            except Exception as e:
+                print(f"[Unexpected Error] {e}")
+            self._queued_at.pop(item[1], None)
+            self._finished += 1
+
+    def backlog(self) -> int:
+        """Number of new tokens still waiting for enrichment."""
+        return self._wanted.qsize()
+
+    def oldest_wait(self) -> float:
+        """Seconds the longest-waiting token has been queued (or in a worker), 0 if none."""
+        queued_at = next(iter(self._queued_at.values()), None)
+        return 0.0 if queued_at is None else time.monotonic() - queued_at
+
+    def status(self) -> dict:
+        return {"backlog": self.backlog(), "oldest_wait": round(self.oldest_wait(), 1)}
+
+    async def _emit(self, token: dict):
+        for sink in self.sinks:
+            try:
+                await sink.emit(token)
+            except Exception as e:
+                print(f"[Sink Error] {type(sink).__name__}: {e}")
+
+    async def poll_once(self, heartbeat=lambda: None):
+        resp = await asyncio.to_thread(requests.get, TOKEN_PROFILES_URL, timeout=10)
+        resp.raise_for_status()
+
+        new_profiles = []
+        for p in self.differ.diff(resp.content):
+            token_addr = p["tokenAddress"]
+            self.differ.mark_seen(token_addr)
+            if self.is_known and await asyncio.to_thread(self.is_known, token_addr):
+                continue
+            new_profiles.append(p)
+
+        demand = {}
+        for token in [describe_profile(p) for p in new_profiles]:
+            chain_id = token["chain_id"]
+            if chain_id not in demand:
+                demand[chain_id] = 1 if self.demand is None else await asyncio.to_thread(self.demand, chain_id)
+            if demand[chain_id] > 0:
+                arrival = next(self._arrival)
+                self._queued_at[arrival] = time.monotonic()
+                self._wanted.put_nowait((-demand[chain_id], arrival, token))
+            else:
+                await self._emit(token)
+        self.differ.commit()
+
+    async def run(self, heartbeat=lambda: None):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        finished = self._finished
+        try:
+            while True:
+                # Only beat while the workers make progress (or have nothing to do)
+                if self._finished != finished or not self._queued_at:
+                    heartbeat()
+                finished = self._finished
+                try:
+                    await self.poll_once(heartbeat)
+                    await asyncio.sleep(self.poll_interval)
+                except requests.exceptions.RequestException as e:
+                    print(f"[Request Error] {e}")
+                    await asyncio.sleep(self.poll_interval)
+                except Exception as e:
+                    print(f"[Unexpected Error] {e}")
+                    await asyncio.sleep(3)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import requests
+
+from .alert_queue import AlertQueue
+from .enrich import display_count
+from .token_store import append_token
+
+# ------------------------------------------------------------------------------
+# Sinks: where the Monitor delivers enriched tokens
+# ------------------------------------------------------------------------------
+# Every sink has an `async emit(token)` method. Blocking work (file/HTTP/SQLite)
+# runs in a thread so a slow sink never stalls the event loop.
+# ------------------------------------------------------------------------------
+class ConsoleSink:
+    """Print tokens in the classic console monitor format."""
+
+    def __init__(self, show_members: bool = True):
+        self.show_members = show_members
+
+    async def emit(self, token: dict):
+        telegram_url = token["telegram_url"]
+        twitter_url = token["twitter_url"]
+        print("--- NEW TOKEN FOUND ---")
+        print(f"Chain:        {token['chain_id']}")
+        print(f"TokenAddress: {token['token_address']}")
+        print(f"Description:  {token.get('description', '')}")
+        print(f"Website:      {token['website_url']}")
+        if telegram_url != "N/A" and self.show_members:
+            print(f"Telegram:     ({display_count(token, 'telegram_members')} members) {telegram_url}")
+        else:
+            print(f"Telegram:     {telegram_url}")
+        if twitter_url != "N/A":
+            print(f"Twitter:      {twitter_url} (Followers: {display_count(token, 'followers')})")
+        else:
+            print("Twitter:      N/A")
+        for kind, count in token.get("social_reuse", {}).items():
+            print(f"Reused:       {kind} link used by {count} previous token(s)")
+        print("-" * 60)
+
+
+class JsonlSink:
+    """Append one JSON object per token to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, token: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(token) + "\n")
+
+    async def emit(self, token: dict):
+        await asyncio.to_thread(self._write, token)
+
+
+class WebhookSink:
+    """POST each token as JSON to a URL."""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, token: dict):
+        requests.post(self.url, json=token, timeout=self.timeout).raise_for_status()
+
+    async def emit(self, token: dict):
+        await asyncio.to_thread(self._post, token)
+
+
+class TelegramSink:
+    """Send each token to a set of Telegram chats using a python-telegram-bot Bot."""
+
+    def __init__(self, bot, format_message, chat_ids=None):
+        self.bot = bot
+        self.format_message = format_message
+        self.chat_ids = chat_ids if chat_ids is not None else set()
+
+    async def emit(self, token: dict):
+        message = self.format_message(token)
+        for chat_id in list(self.chat_ids):
+            await self.bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+
+
+class StoreSink:
+    """Persist tokens in the token archive."""
+
+    async def emit(self, token: dict):
+        await asyncio.to_thread(append_token, token)
+
+
+class QueueSink:
+    """
+    Put tokens on the durable alert queue for delivery workers.
+    Tokens left un-enriched for lack of consumers are only recorded, so a
+    restarted ingester still recognises them, and are not delivered.
+    """
+
+    def __init__(self, queue: AlertQueue):
+        self.queue = queue
+
+    async def emit(self, token: dict):
+        await asyncio.to_thread(self.queue.put, token, token.get("enriched", True))
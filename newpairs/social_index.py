@@ -0,0 +1,102 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+# ------------------------------------------------------------------------------
+# Social-Link Reuse Index
+# ------------------------------------------------------------------------------
+# Many launches reuse the Twitter handle, Telegram group or website of an
+# earlier token. The index maps each normalized link to:
+#   * how many tokens used it so far (a fast copycat signal), and
+#   * the last follower/member count looked up for it, so enrichment can reuse
+#     a recent result instead of asking Nitter/Telethon again, and
+#   * when a lookup for it last failed, so a dead handle or private group is
+#     not retried for every token that links to it.
+# It is rebuilt from the token history at startup (see enrich.load_social_history).
+# Links unused for `forget_after` seconds and stale lookup results are pruned
+# every PRUNE_EVERY new tokens, so the index does not grow without bound.
+# ------------------------------------------------------------------------------
+# Domains that many unrelated tokens link to; reusing them means nothing
+SHARED_DOMAINS = {
+    "x.com", "twitter.com", "t.me", "linktr.ee", "pump.fun",
+    "dexscreener.com", "github.com", "medium.com", "youtube.com",
+}
+PRUNE_EVERY = 1000
+
+def normalize_handle(handle: str) -> str:
+    return handle.strip().lstrip("@").lower() if handle else None
+
+def normalize_domain(website_url: str) -> str:
+    if not website_url or website_url == "N/A":
+        return None
+    netloc = urlparse(website_url if "://" in website_url else f"//{website_url}").netloc.lower()
+    netloc = netloc.split(":")[0]
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    return netloc if netloc and netloc not in SHARED_DOMAINS else None
+
+
+class SocialIndex:
+    def __init__(self, reuse_ttl: float, forget_after: float, failure_ttl: float = 0):
+        self.reuse_ttl = reuse_ttl
+        self.forget_after = forget_after
+        self.failure_ttl = failure_ttl
+        self._uses = {}       # (kind, key) -> (number of tokens that used it, last used at)
+        self._results = {}    # (kind, key) -> (value, checked_at wall-clock seconds)
+        self._failures = {}   # (kind, key) -> failed_at wall-clock seconds
+        self._lock = threading.Lock()
+        self._added = 0
+
+    def lookup(self, kind: str, key: str):
+        """Return a recent lookup result for this link, or None."""
+        if not key:
+            return None
+        hit = self._results.get((kind, key))
+        if hit and time.time() - hit[1] < self.reuse_ttl:
+            return hit[0]
+        return None
+
+    def record_result(self, kind: str, key: str, value, checked_at: float = None):
+        if key:
+            with self._lock:
+                self._results[(kind, key)] = (value, checked_at or time.time())
+                self._failures.pop((kind, key), None)
+
+    def record_failure(self, kind: str, key: str):
+        if key:
+            with self._lock:
+                self._failures[(kind, key)] = time.time()
+
+    def failed_recently(self, kind: str, key: str) -> bool:
+        """True if a lookup for this link failed within the last failure_ttl seconds."""
+        failed_at = self._failures.get((kind, key))
+        return failed_at is not None and time.time() - failed_at < self.failure_ttl
+
+    def add_token(self, keys: dict, seen_at: float = None) -> dict:
+        """
+        Count a new token's links. `keys` maps kind -> normalized key.
+        Returns {kind: number of previous tokens that used the same link}
+        for every link that was used before.
+        """
+        seen_at = seen_at or time.time()
+        reuse = {}
+        with self._lock:
+            for kind, key in keys.items():
+                if not key:
+                    continue
+                previous = self._uses.get((kind, key), (0, 0))[0]
+                if previous:
+                    reuse[kind] = previous
+                self._uses[(kind, key)] = (previous + 1, seen_at)
+            self._added += 1
+            if self._added % PRUNE_EVERY == 0:
+                self._prune(seen_at)
+        return reuse
+
+    def _prune(self, now: float):
+        self._uses = {k: v for k, v in self._uses.items() if now - v[1] < self.forget_after}
+        self._results = {k: v for k, v in self._results.items() if now - v[1] < self.reuse_ttl}
+        self._failures = {k: v for k, v in self._failures.items() if now - v < self.failure_ttl}
+
+    def size(self) -> dict:
+        return {"links": len(self._uses), "results": len(self._results), "failures": len(self._failures)}
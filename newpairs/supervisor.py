@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import time
+
+# ------------------------------------------------------------------------------
+# Background Task Supervisor
+# ------------------------------------------------------------------------------
+# Owns the long-running loops (poller, delivery workers, ...). Every loop gets a
+# `heartbeat` callable that it calls once per iteration. The supervisor restarts
+# a loop with exponential backoff when it crashes or when no heartbeat arrived
+# within `stall_after` seconds, so a loop can be silently dead for at most
+# stall_after + CHECK_INTERVAL seconds.
+#
+# It also measures event loop lag (how late its own timer fires), which shows
+# when something is blocking the loop, and can serve both as JSON on
+# HEALTH_PORT for the platform's health checks. `stats` adds counters of the
+# process (e.g. enrichment outcomes) to that JSON.
+# ------------------------------------------------------------------------------
+CHECK_INTERVAL = 5          # Seconds between supervisor checks
+MAX_BACKOFF = 60            # Upper bound for the restart delay
+MAX_LOOP_LAG = 5            # Event loop lag (seconds) above which we report unhealthy
+HEALTH_PORT = os.getenv("HEALTH_PORT")
+
+
+class SupervisedTask:
+    def __init__(self, name: str, factory, stall_after: float):
+        self.name = name
+        self.factory = factory          # factory(heartbeat) -> coroutine
+        self.stall_after = stall_after
+        self.task = None
+        self.started_at = 0.0
+        self.last_beat = 0.0
+        self.lag = 0.0                  # Longest gap between heartbeats since start
+        self.restarts = 0
+        self.backoff = 1
+        self.restart_at = 0.0
+        self.last_error = None
+
+    def beat(self):
+        now = time.monotonic()
+        self.lag = max(self.lag, now - self.last_beat)
+        self.last_beat = now
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        running = self.task is not None and not self.task.done()
+        return {
+            "running": running,
+            "healthy": running and now - self.last_beat <= self.stall_after,
+            "last_beat_age": round(now - self.last_beat, 2),
+            "max_beat_gap": round(self.lag, 2),
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
+
+
+class Supervisor:
+    def __init__(self, stats: dict = None):
+        self.tasks = {}
+        self.loop_lag = 0.0
+        self.stats = stats or {}   # name -> callable returning a JSON-serialisable dict
+
+    def add(self, name: str, factory, stall_after: float = 120):
+        """Register a loop. `factory` receives a heartbeat callable and returns a coroutine."""
+        self.tasks[name] = SupervisedTask(name, factory, stall_after)
+
+    def _start(self, st: SupervisedTask):
+        st.started_at = st.last_beat = time.monotonic()
+        st.lag = 0.0
+        st.task = asyncio.create_task(st.factory(st.beat), name=st.name)
+
+    def _check(self, st: SupervisedTask):
+        now = time.monotonic()
+        if st.task is None:
+            if now >= st.restart_at:
+                self._start(st)
+            return
+
+        if st.task.done():
+            if st.task.cancelled():
+                st.last_error = "cancelled"
+            else:
+                st.last_error = repr(st.task.exception()) if st.task.exception() else "exited"
+            print(f"[Supervisor] {st.name} stopped ({st.last_error}), restarting in {st.backoff}s")
+        elif now - st.last_beat > st.stall_after:
+            st.last_error = f"stalled for {now - st.last_beat:.0f}s"
+            print(f"[Supervisor] {st.name} {st.last_error}, restarting in {st.backoff}s")
+            st.task.cancel()
+        else:
+            # A loop that stayed healthy for a full stall window earns its backoff back
+            if now - st.started_at > st.stall_after:
+                st.backoff = 1
+            return
+
+        st.task = None
+        st.restarts += 1
+        st.restart_at = now + st.backoff
+        st.backoff = min(st.backoff * 2, MAX_BACKOFF)
+
+    def health(self) -> dict:
+        tasks = {name: st.status() for name, st in self.tasks.items()}
+        return {
+            "healthy": self.loop_lag <= MAX_LOOP_LAG and all(t["healthy"] for t in tasks.values()),
+            "loop_lag": round(self.loop_lag, 3),
+            "tasks": tasks,
+            **{name: get() for name, get in self.stats.items()},
+        }
+
+    async def _serve_health(self, reader, writer):
+        try:
+            await reader.readline()
+            health = self.health()
+            body = json.dumps(health).encode()
+            status = "200 OK" if health["healthy"] else "503 Service Unavailable"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self):
+        """Start every registered loop and keep them alive until cancelled."""
+        server = None
+        if HEALTH_PORT:
+            server = await asyncio.start_server(self._serve_health, "0.0.0.0", int(HEALTH_PORT))
+            print(f"[Supervisor] Health endpoint listening on port {HEALTH_PORT}")
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                for st in self.tasks.values():
+                    self._check(st)
+                expected = loop.time() + CHECK_INTERVAL
+                await asyncio.sleep(CHECK_INTERVAL)
+                self.loop_lag = max(0.0, loop.time() - expected)
+                if self.loop_lag > MAX_LOOP_LAG:
+                    print(f"[Supervisor] Event loop lagging by {self.loop_lag:.1f}s")
+        finally:
+            for st in self.tasks.values():
+                if st.task is not None:
+                    st.task.cancel()
+            if server is not None:
+                server.close()
@@ -0,0 +1,380 @@
+import fcntl
+import gzip
+import json
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# ------------------------------------------------------------------------------
+# Token Store
+# ------------------------------------------------------------------------------
+# Token history is kept in ARCHIVE_DIR, partitioned by UTC day of `seen_at`:
+#
+#   hot.jsonl             tokens of the last HOT_DAYS days, one JSON per line
+#                         (appending a token never rewrites older data)
+#   YYYY-MM-DD.jsonl.gz   compressed, closed day segments
+#   manifest.json         seq/time range of every segment, the last seq and
+#                         the set of chains seen, so readers can skip whole
+#                         segments and startup never has to read history
+#   updates.jsonl         newer versions of stored tokens (late lookup results,
+#                         on-demand enrichment), applied on top of the
+#                         segments when reading; merged into them once it holds
+#                         MERGE_UPDATES_AT tokens and before every compaction
+#
+# When a day leaves the hot window its tokens are compacted into a segment, and
+# segments older than RETENTION_DAYS are deleted (0 keeps everything).
+#
+# Each token gets a monotonically increasing "seq" so a chat only needs to
+# remember one integer (its cursor) to know which tokens it has already been
+# shown. The legacy tokens.json is imported once when the archive is created.
+#
+# chat_state.json holds the per-chat settings (filters, cursor and whether the
+# chat gets live alerts) so they survive restarts and are visible to every
+# process sharing this directory.
+# ------------------------------------------------------------------------------
+ARCHIVE_DIR = os.getenv("TOKEN_ARCHIVE_DIR", "token_archive")  # Where tokens are stored
+HOT_DAYS = int(os.getenv("TOKEN_HOT_DAYS", "1"))                # Days kept uncompressed
+RETENTION_DAYS = int(os.getenv("TOKEN_RETENTION_DAYS", "0"))    # 0 = keep forever
+LEGACY_TOKEN_FILE = "tokens.json"     # Single-array store used before the archive
+CHAT_STATE_FILE = "chat_state.json"   # File where per-chat settings are stored
+
+HOT_FILE = os.path.join(ARCHIVE_DIR, "hot.jsonl")
+MANIFEST_FILE = os.path.join(ARCHIVE_DIR, "manifest.json")
+UPDATES_FILE = os.path.join(ARCHIVE_DIR, "updates.jsonl")
+MERGE_UPDATES_AT = 500   # Updated tokens that trigger rewriting the segments they are in
+LOCK_FILE = os.path.join(ARCHIVE_DIR, ".lock")
+
+DEFAULT_CHAT_STATE = {
+    "chain_filter": None,
+    "follower_filter": 0,
+    "cursor": 0,           # seq of the last token shown via "Show Current Filtered"
+    "subscribed": False,   # Ran /start, so it receives live alerts
+}
+
+_chat_state_lock = threading.Lock()
+_token_lock = threading.Lock()
+
+# Addresses and oldest seen_at of the hot segment, so appending does not re-read
+# it every time. Keyed by the file's (inode, size, mtime) to notice writes made
+# by other processes.
+_hot_cache = {"stat": None, "addresses": set(), "first_at": None}
+
+def _read_json(path: str, default):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return default
+    return default
+
+def _write_json(path: str, data, indent=None):
+    # Write to a temporary file first so readers never see a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+@contextmanager
+def _token_file_lock():
+    # Ingestion appends while the bot may save on-demand enrichment, possibly
+    # from another process, so every read-modify-write holds this lock.
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with _token_lock, open(LOCK_FILE, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+# ------------------------------------------------------------------------------
+# Segments
+# ------------------------------------------------------------------------------
+def _day_of(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+def _segment_path(day: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"{day}.jsonl.gz")
+
+def _parse_lines(lines):
+    return (json.loads(line) for line in lines if line.strip())
+
+def _read_segment(path: str, compressed: bool):
+    """
+    Yield the tokens of a segment, read through a memory map one line at a
+    time, so neither the raw file nor the decompressed data is ever held in
+    memory as a whole. Wrap it in list() where all of them are needed.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if compressed:
+            with gzip.GzipFile(fileobj=mm) as gz:
+                yield from _parse_lines(gz)
+        else:
+            yield from _parse_lines(iter(mm.readline, b""))
+
+def _write_lines(path: str, tokens: list, compressed: bool):
+    tmp_path = f"{path}.tmp"
+    opener = gzip.open if compressed else open
+    with opener(tmp_path, "wt") as f:
+        for token in tokens:
+            f.write(json.dumps(token) + "\n")
+    os.replace(tmp_path, path)
+
+def _segment_info(tokens: list) -> dict:
+    return {
+        "first_seq": tokens[0]["seq"],
+        "last_seq": tokens[-1]["seq"],
+        "first_at": min(t["seen_at"] for t in tokens),
+        "last_at": max(t["seen_at"] for t in tokens),
+        "count": len(tokens),
+    }
+
+def _load_manifest() -> dict:
+    return _read_json(MANIFEST_FILE, None)
+
+def _ensure_archive():
+    if not os.path.exists(MANIFEST_FILE):
+        with _token_file_lock():
+            if not os.path.exists(MANIFEST_FILE):
+                _import_legacy_tokens()
+
+def _import_legacy_tokens():
+    """
+    Create the archive, importing tokens.json if present. Legacy tokens have no
+    seen_at; they are dated by the file's modification time.
+    """
+    manifest = {"last_seq": 0, "chains": [], "segments": {}}
+    legacy = _read_json(LEGACY_TOKEN_FILE, [])
+    if legacy:
+        seen_at = int(os.path.getmtime(LEGACY_TOKEN_FILE))
+        for i, token in enumerate(legacy, start=1):
+            token.setdefault("seq", i)
+            token.setdefault("seen_at", seen_at)
+        by_day = {}
+        for token in legacy:
+            by_day.setdefault(_day_of(token["seen_at"]), []).append(token)
+        for day, tokens in by_day.items():
+            _write_lines(_segment_path(day), tokens, compressed=True)
+            manifest["segments"][day] = _segment_info(tokens)
+        manifest["last_seq"] = legacy[-1]["seq"]
+        manifest["chains"] = sorted({t.get("chain_id", "") for t in legacy} - {""})
+    _write_json(MANIFEST_FILE, manifest, indent=2)
+
+def _compact(manifest: dict, hot: list, now: float) -> list:
+    """
+    Move days that left the hot window into compressed segments and drop
+    segments past retention. Returns the tokens that stay hot.
+
+    The manifest is saved before the hot file is rewritten: a crash in
+    between leaves the moved tokens in both places (the next compaction
+    skips the copies already in a segment) instead of losing them.
+    """
+    hot_from = _day_of(now - (HOT_DAYS - 1) * 86400)
+    keep, closed = [], {}
+    for token in hot:
+        day = _day_of(token["seen_at"])
+        if day >= hot_from:
+            keep.append(token)
+        else:
+            closed.setdefault(day, []).append(token)
+
+    for day, tokens in closed.items():
+        path = _segment_path(day)
+        if day in manifest["segments"]:
+            stored = list(_read_segment(path, compressed=True))
+            stored_seqs = {t["seq"] for t in stored}
+            tokens = stored + [t for t in tokens if t["seq"] not in stored_seqs]
+        _write_lines(path, tokens, compressed=True)
+        manifest["segments"][day] = _segment_info(tokens)
+
+    expired = []
+    if RETENTION_DAYS > 0:
+        oldest = _day_of(now - RETENTION_DAYS * 86400)
+        expired = [d for d in manifest["segments"] if d < oldest]
+        for day in expired:
+            del manifest["segments"][day]
+
+    if closed or expired:
+        _write_json(MANIFEST_FILE, manifest, indent=2)
+    for day in expired:
+        if os.path.exists(_segment_path(day)):
+            os.remove(_segment_path(day))
+    if closed:
+        _write_lines(HOT_FILE, keep, compressed=False)
+    return keep
+
+def _hot_stat():
+    try:
+        st = os.stat(HOT_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _hot_index() -> dict:
+    """Addresses in the hot segment; re-read only when the file changed."""
+    stat = _hot_stat()
+    if stat != _hot_cache["stat"]:
+        hot = list(_read_segment(HOT_FILE, compressed=False))
+        _hot_cache.update(
+            stat=stat,
+            addresses={t.get("token_address") for t in hot},
+            first_at=hot[0]["seen_at"] if hot else None,
+        )
+    return _hot_cache
+
+def _load_updates() -> dict:
+    """Recorded updates not merged yet, {seq: latest token record}."""
+    return {t["seq"]: t for t in _read_segment(UPDATES_FILE, compressed=False)}
+
+def _merge_updates(manifest: dict):
+    """
+    Write the recorded updates into the hot file and the day segments that
+    hold those tokens, then drop the updates file. A crash in between leaves
+    the file in place and the next merge applies the same updates again.
+    """
+    by_seq = _load_updates()
+    if by_seq:
+        targets = [(HOT_FILE, False)] + [
+            (_segment_path(day), True)
+            for day, info in manifest["segments"].items()
+            if any(info["first_seq"] <= seq <= info["last_seq"] for seq in by_seq)
+        ]
+        for path, compressed in targets:
+            tokens = list(_read_segment(path, compressed))
+            if any(t["seq"] in by_seq for t in tokens):
+                _write_lines(path, [by_seq.get(t["seq"], t) for t in tokens], compressed)
+    if os.path.exists(UPDATES_FILE):
+        os.remove(UPDATES_FILE)
+
+# ------------------------------------------------------------------------------
+# Tokens
+# ------------------------------------------------------------------------------
+def append_token(token: dict):
+    """
+    Store a new token, assigning its seq. Returns None if the token is already
+    in the hot segment (older duplicates are filtered upstream by the queue).
+    """
+    token.setdefault("seen_at", int(time.time()))
+    _ensure_archive()
+    with _token_file_lock():
+        manifest = _load_manifest()
+        index = _hot_index()
+        # Check if token_address already exists
+        if token.get("token_address") in index["addresses"]:
+            return None
+
+        now = time.time()
+        hot_from = _day_of(now - (HOT_DAYS - 1) * 86400)
+        if index["first_at"] is not None and _day_of(index["first_at"]) < hot_from:
+            _merge_updates(manifest)
+            _compact(manifest, list(_read_segment(HOT_FILE, compressed=False)), now)
+            index = _hot_index()
+
+        token["seq"] = manifest["last_seq"] + 1
+        with open(HOT_FILE, "a") as f:
+            f.write(json.dumps(token) + "\n")
+        index["addresses"].add(token.get("token_address"))
+        if index["first_at"] is None:
+            index["first_at"] = token["seen_at"]
+        index["stat"] = _hot_stat()
+        manifest["last_seq"] = token["seq"]
+        if token.get("chain_id") and token["chain_id"] not in manifest["chains"]:
+            manifest["chains"] = sorted(manifest["chains"] + [token["chain_id"]])
+        _write_json(MANIFEST_FILE, manifest, indent=2)
+    return token
+
+def update_tokens(updated: list):
+    """
+    Replace stored tokens (matched by seq) with updated records. They are
+    appended to the updates file, so a single late result does not rewrite
+    the hot file or a day segment; see _merge_updates.
+    """
+    if not updated:
+        return
+    _ensure_archive()
+    with _token_file_lock():
+        with open(UPDATES_FILE, "a") as f:
+            for token in updated:
+                f.write(json.dumps(token) + "\n")
+        if len(_load_updates()) >= MERGE_UPDATES_AT:
+            _merge_updates(_load_manifest())
+
+def scan_tokens(after_seq: int = 0, since: float = None, until: float = None):
+    """
+    Yield stored tokens oldest first, reading only the segments that can
+    contain tokens with seq > after_seq and seen_at within [since, until].
+    """
+    _ensure_archive()
+    updates = _load_updates()
+    manifest = _load_manifest()
+    for day in sorted(manifest["segments"]):
+        info = manifest["segments"][day]
+        if info["last_seq"] <= after_seq:
+            continue
+        if (since is not None and info["last_at"] < since) or (until is not None and info["first_at"] > until):
+            continue
+        yield from _filter_tokens(_read_segment(_segment_path(day), compressed=True), updates, after_seq, since, until)
+    yield from _filter_tokens(_read_segment(HOT_FILE, compressed=False), updates, after_seq, since, until)
+
+def _filter_tokens(tokens, updates: dict, after_seq: int, since: float, until: float):
+    for token in tokens:
+        if token["seq"] <= after_seq:
+            continue
+        if since is not None and token["seen_at"] < since:
+            continue
+        if until is not None and token["seen_at"] > until:
+            continue
+        yield updates.get(token["seq"], token)
+
+def load_tokens_after(cursor: int) -> list:
+    """Tokens stored after the given sequence number, oldest first."""
+    return list(scan_tokens(after_seq=cursor))
+
+def load_token(seq: int):
+    """A single stored token by seq, or None (reads at most one segment)."""
+    _ensure_archive()
+    manifest = _load_manifest()
+    for day, info in manifest["segments"].items():
+        if info["first_seq"] <= seq <= info["last_seq"]:
+            tokens = _read_segment(_segment_path(day), compressed=True)
+            break
+    else:
+        tokens = _read_segment(HOT_FILE, compressed=False)
+    token = next((t for t in tokens if t["seq"] == seq), None)
+    return None if token is None else _load_updates().get(seq, token)
+
+def load_recent_tokens(days: float) -> list:
+    """Tokens seen within the last `days` days, oldest first."""
+    return list(scan_tokens(since=time.time() - days * 86400))
+
+def load_known_chains() -> list:
+    """Every chain a token was ever stored for (read from the manifest only)."""
+    _ensure_archive()
+    return _load_manifest()["chains"]
+
+# ------------------------------------------------------------------------------
+# Per-Chat State
+# ------------------------------------------------------------------------------
+def load_chat_state(chat_id: int) -> dict:
+    states = _read_json(CHAT_STATE_FILE, {})
+    return {**DEFAULT_CHAT_STATE, **states.get(str(chat_id), {})}
+
+def load_subscribed_chats() -> dict:
+    """Chats that receive live alerts, as {chat_id: state}."""
+    states = _read_json(CHAT_STATE_FILE, {})
+    return {
+        int(chat_id): {**DEFAULT_CHAT_STATE, **state}
+        for chat_id, state in states.items()
+        if state.get("subscribed")
+    }
+
+def update_chat_state(chat_id: int, **changes) -> dict:
+    """Apply `changes` to a chat's persisted state and return the new state."""
+    with _chat_state_lock:
+        states = _read_json(CHAT_STATE_FILE, {})
+        state = {**DEFAULT_CHAT_STATE, **states.get(str(chat_id), {}), **changes}
+        states[str(chat_id)] = state
+        _write_json(CHAT_STATE_FILE, states, indent=2)
+    return state
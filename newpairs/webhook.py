@@ -0,0 +1,168 @@
+import asyncio
+import hmac
+import json
+import signal
+
+from telegram import Update
+
+from .config import WEBHOOK_LISTEN, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL
+
+# ------------------------------------------------------------------------------
+# Telegram Webhook Server
+# ------------------------------------------------------------------------------
+# An embedded HTTP server that receives updates pushed by Telegram instead of
+# long-polling for them. Requests must be a POST to WEBHOOK_PATH carrying the
+# X-Telegram-Bot-Api-Secret-Token header set when the webhook was registered.
+# Valid updates are acknowledged immediately and put on the application's
+# update queue; run the application with concurrent_updates so handlers for
+# different updates run at the same time. Headers and body each have to arrive
+# within READ_TIMEOUT, and their size is capped, since the port is public.
+#
+# Recorded Update payloads can be replayed locally, e.g.:
+#   curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \
+#        -d @update.json http://127.0.0.1:$WEBHOOK_PORT/telegram
+# ------------------------------------------------------------------------------
+MAX_BODY_SIZE = 1 << 20     # Telegram updates are far smaller than 1 MiB
+MAX_HEADERS = 64            # Header lines accepted per request
+MAX_HEADER_SIZE = 16 << 10  # Bytes accepted for the request line and headers
+READ_TIMEOUT = 10           # Seconds a client gets to send the headers, and again the body
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+}
+
+
+class WebhookServer:
+    def __init__(self, app, secret_token: str, listen: str = WEBHOOK_LISTEN,
+                 port: int = WEBHOOK_PORT, url_path: str = WEBHOOK_PATH):
+        if not secret_token:
+            raise ValueError("A webhook secret token is required")
+        self.app = app
+        self.secret_token = secret_token.encode()
+        self.listen = listen
+        self.port = port
+        self.url_path = url_path if url_path.startswith("/") else f"/{url_path}"
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        # Port 0 picks a free port (e.g. for local replay tests)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Webhook server listening on {self.listen}:{self.port}{self.url_path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _respond(self, writer, status: int):
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            "Content-Length: 0\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+    async def _read_head(self, reader):
+        """(request line, headers), or None if they exceed MAX_HEADERS or MAX_HEADER_SIZE."""
+        request_line = await reader.readline()
+        size, count, headers = len(request_line), 0, {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            size += len(line)
+            count += 1
+            if count > MAX_HEADERS or size > MAX_HEADER_SIZE:
+                return None
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line.decode("latin-1").split(), headers
+
+    async def _handle(self, reader, writer):
+        try:
+            # The server is public: slow or idle clients and oversized heads are
+            # cut off instead of holding a handler (and memory) indefinitely
+            try:
+                head = await asyncio.wait_for(self._read_head(reader), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                return await self._respond(writer, 408)
+            if head is None:
+                return await self._respond(writer, 400)
+            request_line, headers = head
+
+            if len(request_line) < 2 or request_line[1].split("?")[0] != self.url_path:
+                return await self._respond(writer, 404)
+            if request_line[0] != "POST":
+                return await self._respond(writer, 405)
+            if not hmac.compare_digest(headers.get(SECRET_HEADER, "").encode(), self.secret_token):
+                return await self._respond(writer, 403)
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_SIZE:
+                return await self._respond(writer, 413)
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                return await self._respond(writer, 408)
+            try:
+                data = json.loads(body)
+                if not isinstance(data, dict):
+                    return await self._respond(writer, 400)
+                update = Update.de_json(data, self.app.bot)
+            except (ValueError, TypeError, KeyError, AttributeError):
+                return await self._respond(writer, 400)
+
+            await self.app.update_queue.put(update)
+            await self._respond(writer, 200)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"[Webhook Error] {e}")
+        finally:
+            writer.close()
+
+
+async def _serve(app, server: WebhookServer, webhook_url: str):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with app:
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+        await server.start()
+        if webhook_url:
+            await app.bot.set_webhook(
+                webhook_url,
+                secret_token=server.secret_token.decode(),
+                allowed_updates=Update.ALL_TYPES,
+            )
+        try:
+            await stop.wait()
+        finally:
+            # Stop accepting updates first, then let the application finish
+            # the queued ones and stop its background tasks.
+            await server.stop()
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+
+
+def run_webhook(app, secret_token: str = WEBHOOK_SECRET, webhook_url: str = WEBHOOK_URL):
+    """
+    Blocking counterpart of app.run_polling() for webhook mode.
+    If `webhook_url` is set the webhook is (re)registered with Telegram on start;
+    leave it empty when registration is handled elsewhere or for local testing.
+    """
+    print("Bot is running (webhook)...")
+    asyncio.run(_serve(app, WebhookServer(app, secret_token), webhook_url))
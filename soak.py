@@ -0,0 +1,575 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+from contextlib import closing
+from types import SimpleNamespace
+
+# ------------------------------------------------------------------------------
+# Soak Test
+# ------------------------------------------------------------------------------
+# Replays days of synthetic token launches in minutes against chain.py's
+# ingestion and delivery loops, with many chats and a realistic filter mix.
+# Every external service is a local stand-in:
+#   * DexScreener  -> an HTTP server serving the latest synthetic profiles
+#   * Nitter       -> a fake client with random latency, hangs and errors
+#   * Telethon     -> the same, for Telegram member counts
+#   * Telegram Bot -> a fake bot with simulated send latency
+# The token store, social index, enrichment and alert queue see an accelerated
+# wall clock, so day rollovers, compaction, TTLs, digest windows, leases and
+# retry backoff happen as they would over a real week.
+#
+# Every simulated hour RSS, event-loop lag, per-operation latency, the size of
+# long-lived structures and the alert queue's depth (pending and batched) are
+# recorded, along with how long alerts waited between being queued and sent
+# ("time_to_send", in real seconds like the other latencies; --report writes
+# the samples as JSONL). After
+# a warm-up (history and caches fill up from empty), the first simulated day is
+# the baseline; the run fails (exit 1) when the last day grew past the
+# thresholds compared to it.
+#
+#   python soak.py                       # a week in 10 minutes, 200 chats
+#   python soak.py --days 2 --minutes 2  # quick check
+# ------------------------------------------------------------------------------
+CHAIN_MIX = {
+    "solana": 0.60, "base": 0.12, "bsc": 0.08, "ethereum": 0.06, "sui": 0.04,
+    "hbar": 0.02, "bera": 0.02, "ink": 0.02, "xrp": 0.02, "tron": 0.02,
+}
+# (chain_filter, follower_filter) -> share of chats
+FILTER_MIX = {
+    (None, 0): 0.35, (None, 1000): 0.15, (None, 10000): 0.05,
+    ("solana", 0): 0.15, ("solana", 5000): 0.10, ("base", 0): 0.08,
+    ("bsc", 1000): 0.05, ("sui", 0): 0.04, ("ethereum", 0): 0.03,
+}
+FEED_SIZE = 30          # DexScreener returns about this many latest profiles
+HANDLE_REUSE = 0.15     # Share of launches reusing an earlier handle/group/site
+BURST_CHANCE = 0.05     # Chance per simulated hour of a launch burst
+BURST_FACTOR = 5
+BURST_SECONDS = 1200
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay synthetic token launches and check for resource growth.")
+    parser.add_argument("--days", type=float, default=7, help="simulated days to replay")
+    parser.add_argument("--minutes", type=float, default=10, help="real minutes to replay them in")
+    parser.add_argument("--chats", type=int, default=200, help="number of chats using the bot")
+    parser.add_argument("--launches-per-day", type=int, default=2000, help="average token launches per day")
+    parser.add_argument("--checks-per-day", type=float, default=2, help="'Show Current Filtered' requests per chat per day")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="real seconds between feed polls")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--warmup-days", type=float, default=1, help="simulated days before the baseline day")
+    parser.add_argument("--max-rss-growth", type=float, default=64, help="MB of RSS growth allowed, last day vs baseline")
+    parser.add_argument("--max-loop-lag", type=float, default=0.5, help="seconds of event-loop lag allowed after warm-up")
+    parser.add_argument("--max-latency-growth", type=float, default=3, help="allowed p95 latency ratio, last day vs baseline")
+    parser.add_argument("--latency-floor", type=float, default=0.05, help="p95 seconds below which latency growth is ignored")
+    parser.add_argument("--max-task-growth", type=int, default=50, help="asyncio tasks allowed on top of the baseline count")
+    parser.add_argument("--max-queue-growth", type=int, default=200,
+                        help="alerts waiting (pending + batched) allowed on top of the baseline peak")
+    parser.add_argument("--report", help="write the per-hour samples to this JSONL file")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory (store, queue, log)")
+    return parser.parse_args()
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def weighted_choice(rng: random.Random, mix: dict):
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+# ------------------------------------------------------------------------------
+# Simulated Clock
+# ------------------------------------------------------------------------------
+class SimClock:
+    """Stands in for the `time` module: time() runs `speed` times faster."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.start = time.time()
+        self._mono_start = time.monotonic()
+
+    def elapsed(self) -> float:
+        return (time.monotonic() - self._mono_start) * self.speed
+
+    def time(self) -> float:
+        return self.start + self.elapsed()
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+# ------------------------------------------------------------------------------
+# Stand-ins for External Services
+# ------------------------------------------------------------------------------
+class FakeFeed:
+    """
+    Local DexScreener: launches arrive as a Poisson process with a daily cycle
+    and occasional bursts; GET returns the newest FEED_SIZE profiles.
+    """
+
+    def __init__(self, clock: SimClock, launches_per_day: int, rng: random.Random):
+        self.clock = clock
+        self.rate = launches_per_day / 86400
+        self.rng = rng
+        self.latest = deque(maxlen=FEED_SIZE)
+        self.launched = 0
+        self._next_at = 0.0
+        self._burst_until = -1.0
+        self._last_hour = -1
+        self._recent_links = deque(maxlen=500)
+        self._server = None
+
+    def _rate_at(self, t: float) -> float:
+        hour = int(t // 3600)
+        if hour != self._last_hour:
+            self._last_hour = hour
+            if self.rng.random() < BURST_CHANCE:
+                self._burst_until = t + BURST_SECONDS
+        diurnal = 1 + 0.6 * math.sin(2 * math.pi * ((t / 3600) % 24 - 8) / 24)
+        return self.rate * diurnal * (BURST_FACTOR if t < self._burst_until else 1)
+
+    def _links(self, n: int) -> list:
+        if self._recent_links and self.rng.random() < HANDLE_REUSE:
+            return self.rng.choice(self._recent_links)
+        links = []
+        if self.rng.random() < 0.8:
+            links.append({"type": "twitter", "url": f"https://x.com/launch{n}"})
+        if self.rng.random() < 0.7:
+            links.append({"type": "telegram", "url": f"https://t.me/launch{n}"})
+        if self.rng.random() < 0.6:
+            links.append({"label": "Website", "url": f"https://launch{n}.xyz"})
+        self._recent_links.append(links)
+        return links
+
+    def advance(self):
+        now = self.clock.elapsed()
+        while self._next_at <= now:
+            self.launched += 1
+            self.latest.appendleft({
+                "url": f"https://dexscreener.com/token/{self.launched}",
+                "chainId": weighted_choice(self.rng, CHAIN_MIX),
+                "tokenAddress": f"SoakToken{self.launched:012d}",
+                "description": f"Synthetic launch #{self.launched}",
+                "links": self._links(self.launched),
+            })
+            self._next_at += self.rng.expovariate(self._rate_at(self._next_at))
+
+    async def _handle(self, reader, writer):
+        try:
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            self.advance()
+            body = json.dumps(list(self.latest)).encode()
+            writer.write(
+                "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, port: int):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", port)
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+class FakeLookups:
+    """Latency, hang and error model shared by the Nitter and Telethon stand-ins."""
+
+    def __init__(self, rng: random.Random, hang_seconds: float, error_rate=0.01, hang_rate=0.02):
+        self.rng = rng
+        self.hang_seconds = hang_seconds
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+
+    def delay(self) -> float:
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            raise RuntimeError("simulated lookup failure")
+        if roll < self.error_rate + self.hang_rate:
+            return self.hang_seconds
+        return self.rng.uniform(0.005, 0.08)
+
+    def count(self, name: str) -> int:
+        return hash(name) % 50000
+
+
+class FakeNitter(FakeLookups):
+    def get_profile_info(self, handle: str):
+        time.sleep(self.delay())
+        return {"stats": {"followers": self.count(handle)}}
+
+
+class FakeTelethon(FakeLookups):
+    async def get_entity(self, username: str):
+        await asyncio.sleep(self.delay())
+        return SimpleNamespace(participants_count=self.count(username))
+
+    async def disconnect(self):
+        pass
+
+
+class FakeBot:
+    """
+    Telegram with 50-500 ms of latency in simulated time: every chat gets its
+    own alerts, so real-time latency would make the accelerated run send far
+    more messages per real second than any bot ever has to.
+    """
+
+    def __init__(self, stats, rng: random.Random, speed: float, error_rate=0.001):
+        self.stats = stats
+        self.rng = rng
+        self.speed = speed
+        self.error_rate = error_rate
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+        started = time.perf_counter()
+        await asyncio.sleep(self.rng.uniform(0.05, 0.5) / self.speed)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("simulated Telegram error")
+        self.sent += 1
+        self.stats.record("send", time.perf_counter() - started)
+
+
+def fake_update(bot: FakeBot, chat_id: int):
+    # Replies return at once, so "resend" measures the store and enrichment work
+    async def reply_text(text, parse_mode=None, reply_markup=None):
+        bot.sent += 1
+
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+
+
+def fake_context(chat_data: dict):
+    """Handler context of one chat; tasks the handler starts run as plain asyncio tasks."""
+    return SimpleNamespace(
+        chat_data=chat_data,
+        application=SimpleNamespace(create_task=lambda coroutine, update=None: asyncio.create_task(coroutine)),
+    )
+
+# ------------------------------------------------------------------------------
+# Measurements
+# ------------------------------------------------------------------------------
+class OpStats:
+    """Latencies per operation, drained once per sample."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, op: str, seconds: float):
+        self.samples.setdefault(op, []).append(seconds)
+
+    def drain(self) -> dict:
+        samples, self.samples = self.samples, {}
+        summary = {}
+        for op, values in samples.items():
+            values.sort()
+            summary[op] = {
+                "n": len(values),
+                "p50": round(values[len(values) // 2], 4),
+                "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+                "max": round(values[-1], 4),
+            }
+        return summary
+
+def timed(stats: OpStats, op: str, func):
+    """Wrap a blocking or async function so each call's latency is recorded."""
+    if asyncio.iscoroutinefunction(func):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stats.record(op, time.perf_counter() - started)
+    else:
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(op, time.perf_counter() - started)
+    return wrapper
+
+def sample_queue(path: str, since: float, speed: float):
+    """
+    Alert counts per state, and the real-time wait of every alert sent since
+    `since` (queue timestamps are simulated, hence the division by `speed`).
+    """
+    with closing(sqlite3.connect(path)) as conn:
+        counts = dict(conn.execute("SELECT state, COUNT(*) FROM alerts GROUP BY state").fetchall())
+        waits = [row[0] / speed for row in conn.execute(
+            "SELECT sent_at - created_at FROM alerts WHERE state = 'sent' AND sent_at >= ?", (since,)
+        )]
+    return counts, waits
+
+async def measure_loop_lag(state: dict, tick: float = 0.05):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + tick
+        await asyncio.sleep(tick)
+        state["lag"] = max(state["lag"], loop.time() - expected)
+
+# ------------------------------------------------------------------------------
+# Simulated Users
+# ------------------------------------------------------------------------------
+async def run_chats(chain, bot: FakeBot, chat_ids: list, args, speed: float, stats: OpStats, rng: random.Random):
+    """Chats ask for 'Show Current Filtered' at random and sometimes change filters."""
+    interval = 86400 / (len(chat_ids) * args.checks_per_day * speed)
+    slots = asyncio.Semaphore(8)
+    running = set()
+    chat_data = {chat_id: {} for chat_id in chat_ids}
+
+    async def check(chat_id):
+        async with slots:
+            if rng.random() < 0.05:
+                chain_filter, follower_filter = weighted_choice(rng, FILTER_MIX)
+                await asyncio.to_thread(chain.update_chat_state, chat_id,
+                                        chain_filter=chain_filter, follower_filter=follower_filter)
+            started = time.perf_counter()
+            try:
+                await chain.resend_filtered_tokens(fake_update(bot, chat_id), fake_context(chat_data[chat_id]))
+                # Include the on-demand enrichment that continues in the background
+                background = chat_data[chat_id].pop("resend_task", None)
+                if background is not None:
+                    await background
+            except Exception as e:
+                print(f"[Soak] resend failed for {chat_id}: {e}")
+            stats.record("resend", time.perf_counter() - started)
+
+    while True:
+        await asyncio.sleep(rng.expovariate(1 / interval))
+        task = asyncio.create_task(check(rng.choice(chat_ids)))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+# ------------------------------------------------------------------------------
+# Thresholds
+# ------------------------------------------------------------------------------
+def evaluate(rows: list, args) -> list:
+    """
+    Compare the last simulated day with the baseline day after the warm-up
+    (shorter runs use thirds instead); return failure messages.
+    """
+    warmup = min(args.warmup_days, args.days / 3) * 24
+    span = min(24, args.days * 24 / 3)
+    last_hour = rows[-1]["sim_hour"]
+    warm = [r for r in rows if warmup <= r["sim_hour"] < warmup + span]
+    final = [r for r in rows if r["sim_hour"] > last_hour - span]
+    failures = []
+    if not warm or not final:
+        return ["not enough samples to compare"]
+
+    rss_growth = max(r["rss_mb"] for r in final) - max(r["rss_mb"] for r in warm)
+    if rss_growth > args.max_rss_growth:
+        failures.append(f"RSS grew by {rss_growth:.1f} MB (limit {args.max_rss_growth} MB)")
+
+    lag = max(r["loop_lag"] for r in rows if r["sim_hour"] >= warmup)
+    if lag > args.max_loop_lag:
+        failures.append(f"event loop lagged {lag:.2f}s (limit {args.max_loop_lag}s)")
+
+    task_growth = max(r["tasks"] for r in final) - max(r["tasks"] for r in warm)
+    if task_growth > args.max_task_growth:
+        failures.append(f"{task_growth} more asyncio tasks than on the baseline day (limit {args.max_task_growth})")
+
+    def waiting(r):
+        return r["sizes"]["pending"] + r["sizes"]["batched"]
+
+    queue_growth = max(waiting(r) for r in final) - max(waiting(r) for r in warm)
+    if queue_growth > args.max_queue_growth:
+        failures.append(f"{queue_growth} more alerts waiting than on the baseline day (limit {args.max_queue_growth})")
+
+    for op in sorted({op for r in rows for op in r["ops"]}):
+        before = [r["ops"][op]["p95"] for r in warm if op in r["ops"]]
+        after = [r["ops"][op]["p95"] for r in final if op in r["ops"]]
+        if not before or not after:
+            continue
+        p95_before, p95_after = statistics.median(before), statistics.median(after)
+        if p95_after > args.latency_floor and p95_after > p95_before * args.max_latency_growth:
+            failures.append(
+                f"{op} p95 latency grew from {p95_before * 1000:.1f} ms to {p95_after * 1000:.1f} ms "
+                f"(limit x{args.max_latency_growth})"
+            )
+    return failures
+
+def print_summary(rows: list, feed: FakeFeed, bot: FakeBot, out):
+    def day_line(label, day_rows):
+        ops = {}
+        for r in day_rows:
+            for op, s in r["ops"].items():
+                ops.setdefault(op, []).append(s["p95"])
+        latency = ", ".join(f"{op} {statistics.median(v) * 1000:.1f}ms" for op, v in sorted(ops.items()))
+        print(f"  {label}: RSS {max(r['rss_mb'] for r in day_rows):.1f} MB, "
+              f"lag {max(r['loop_lag'] for r in day_rows):.3f}s, p95 {latency}", file=out)
+
+    print(f"Launches: {feed.launched}, messages sent: {bot.sent}", file=out)
+    for day in sorted({r["sim_hour"] // 24 for r in rows}):
+        day_line(f"day {day + 1}", [r for r in rows if r["sim_hour"] // 24 == day])
+    print(f"  sizes at end: {rows[-1]['sizes']}", file=out)
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+async def soak(args, speed: float, feed_port: int, out):
+    # Imported here: configuration is read from the environment on import
+    import chain
+    import newpairs.alert_queue
+    import newpairs.enrich
+    import newpairs.sinks
+    import newpairs.social_index
+    import newpairs.token_store
+    from newpairs import Supervisor
+    from newpairs.config import TELEGRAM_TIMEOUT, TWITTER_TIMEOUT
+
+    clock = SimClock(speed)
+    for module in (newpairs.alert_queue, newpairs.enrich, newpairs.social_index, newpairs.token_store):
+        module.time = clock
+
+    rng = random.Random(args.seed)
+    stats = OpStats()
+    feed = FakeFeed(clock, args.launches_per_day, random.Random(args.seed + 1))
+    await feed.start(feed_port)
+    newpairs.enrich._nitter_client = FakeNitter(random.Random(args.seed + 2), TWITTER_TIMEOUT * 1.5)
+    newpairs.enrich._telethon_client = FakeTelethon(random.Random(args.seed + 3), TELEGRAM_TIMEOUT * 3)
+    bot = FakeBot(stats, random.Random(args.seed + 4), speed)
+
+    chat_ids = list(range(1000, 1000 + args.chats))
+    for chat_id in chat_ids:
+        chain_filter, follower_filter = weighted_choice(rng, FILTER_MIX)
+        chain.update_chat_state(chat_id, chain_filter=chain_filter, follower_filter=follower_filter,
+                                cursor=0, subscribed=True)
+
+    newpairs.sinks.append_token = timed(stats, "append", newpairs.sinks.append_token)
+    chain.alert_queue.claim = timed(stats, "claim", chain.alert_queue.claim)
+    monitor = chain.build_ingest_monitor()
+    monitor.poll_interval = args.poll_interval
+    monitor.poll_once = timed(stats, "poll", monitor.poll_once)
+
+    supervisor = Supervisor(stats={"enrichment": lambda: dict(newpairs.enrich.enrich_stats),
+                                   "ingest": monitor.status})
+    supervisor.add("ingest", monitor.run)
+    supervisor.add("deliver", lambda beat: chain.deliver_alerts(bot, chain.alert_queue, beat))
+    lag = {"lag": 0.0}
+    background = [
+        asyncio.create_task(supervisor.run()),
+        asyncio.create_task(measure_loop_lag(lag)),
+        asyncio.create_task(run_chats(chain, bot, chat_ids, args, speed, stats, rng)),
+    ]
+
+    rows = []
+    report = open(args.report, "w") if args.report else None
+    sampled_at = clock.time()
+    try:
+        for hour in range(int(args.days * 24)):
+            await asyncio.sleep(max(0.0, (hour + 1) * 3600 / speed - clock.elapsed() / speed))
+            counts, waits = sample_queue(chain.alert_queue.path, sampled_at, speed)
+            sampled_at = clock.time()
+            for wait in waits:
+                stats.record("time_to_send", wait)
+            row = {
+                "sim_hour": hour,
+                "rss_mb": round(rss_mb(), 1),
+                "loop_lag": round(lag["lag"], 4),
+                "tasks": len(asyncio.all_tasks()),
+                "ops": stats.drain(),
+                "enrichment": supervisor.health()["enrichment"],
+                "sizes": {
+                    "launched": feed.launched,
+                    "feed_seen": len(monitor.differ.seen),
+                    **newpairs.enrich.social_index.size(),
+                    "late_lookups": len(newpairs.enrich._late_lookups),
+                    "hot_addresses": len(newpairs.token_store._hot_cache["addresses"]),
+                    "enrich_backlog": monitor.backlog(),
+                    "restarts": sum(st.restarts for st in supervisor.tasks.values()),
+                    "pending": counts.get("pending", 0),
+                    "batched": counts.get("batched", 0),
+                    "failed": counts.get("failed", 0),
+                },
+            }
+            lag["lag"] = 0.0
+            rows.append(row)
+            if report:
+                report.write(json.dumps(row) + "\n")
+                report.flush()
+            if hour % 24 == 23:
+                print(f"[Soak] day {hour // 24 + 1}: {feed.launched} launches, "
+                      f"RSS {row['rss_mb']} MB, social index {row['sizes']['links']} links", file=out)
+    finally:
+        if report:
+            report.close()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await feed.stop()
+
+    print_summary(rows, feed, bot, out)
+    return evaluate(rows, args)
+
+def main():
+    args = parse_args()
+    if args.report:
+        args.report = os.path.abspath(args.report)
+    speed = args.days * 86400 / (args.minutes * 60)
+    feed_port = free_port()
+    workdir = tempfile.mkdtemp(prefix="newpairs-soak-")
+    out = sys.stdout
+
+    # chain.py reads its run mode from argv and its paths relative to the cwd
+    os.environ.update({
+        "RUN_MODE": "all",
+        "TOKEN_PROFILES_URL": f"http://127.0.0.1:{feed_port}/token-profiles/latest/v1",
+        "ALERT_QUEUE_PATH": os.path.join(workdir, "alerts.db"),
+        "TOKEN_ARCHIVE_DIR": os.path.join(workdir, "token_archive"),
+        "HEALTH_PORT": "",
+    })
+    for name, value in (("ENRICH_DEADLINE", "0.5"), ("TWITTER_TIMEOUT", "1"), ("TELEGRAM_TIMEOUT", "1")):
+        os.environ.setdefault(name, value)
+    os.environ.pop("DEFAULT_CHAT_ID", None)
+    sys.argv = sys.argv[:1]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+
+    print(f"[Soak] {args.days:g} days in {args.minutes:g} minutes ({speed:.0f}x), "
+          f"{args.chats} chats, working in {workdir}", file=out)
+    log_path = os.path.join(workdir, "soak.log")
+    try:
+        with open(log_path, "w") as log, contextlib.redirect_stdout(log):
+            failures = asyncio.run(soak(args, speed, feed_port, out))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("FAILED:", file=out)
+        for failure in failures:
+            print(f"  - {failure}", file=out)
+        sys.exit(1)
+    print("PASSED", file=out)
+
+if __name__ == "__main__":
+    main()
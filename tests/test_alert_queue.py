@@ -0,0 +1,167 @@
+from contextlib import closing
+
+import pytest
+
+import newpairs.alert_queue
+from newpairs.alert_queue import (
+    BATCHED,
+    CLAIMED,
+    FAILED,
+    MAX_ATTEMPTS,
+    PENDING,
+    RETRY_DELAY,
+    SENT,
+    AlertQueue,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(newpairs.alert_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return AlertQueue(str(tmp_path / "alerts.db"), lease_seconds=60)
+
+
+def token(address: str) -> dict:
+    return {"token_address": address, "chain_id": "solana"}
+
+
+def state(queue: AlertQueue, alert_id: int) -> str:
+    with closing(queue._connect()) as conn:
+        return conn.execute("SELECT state FROM alerts WHERE id = ?", (alert_id,)).fetchone()[0]
+
+
+def test_put_is_unique_per_token(queue):
+    assert queue.put(token("a"))
+    assert not queue.put(token("a"))
+    assert queue.put(token("b"), deliver=False)
+    assert queue.contains("a") and queue.contains("b")
+    assert not queue.contains("c")
+
+
+def test_claim_oldest_first_and_skipped_never(queue):
+    queue.put(token("skipped"), deliver=False)
+    queue.put(token("a"))
+    queue.put(token("b"))
+    first = queue.claim("w1")
+    second = queue.claim("w2")
+    assert first[1]["token_address"] == "a"
+    assert second[1]["token_address"] == "b"
+    assert queue.claim("w3") is None
+
+
+def test_ack_marks_sent_and_drops_payload(queue):
+    queue.put(token("a"))
+    alert_id, _ = queue.claim("w1")
+    queue.ack(alert_id)
+    assert state(queue, alert_id) == SENT
+    with closing(queue._connect()) as conn:
+        assert conn.execute("SELECT payload FROM alerts WHERE id = ?", (alert_id,)).fetchone()[0] == "{}"
+    assert queue.claim("w1") is None
+    assert queue.contains("a")
+
+
+def test_expired_lease_is_claimed_again(queue, clock):
+    queue.put(token("a"))
+    alert_id, _ = queue.claim("crashed")
+    assert state(queue, alert_id) == CLAIMED
+    clock.now += 59
+    assert queue.claim("w2") is None
+    clock.now += 2
+    reclaimed = queue.claim("w2")
+    assert reclaimed[0] == alert_id
+
+
+def test_release_backs_off_then_fails(queue, clock):
+    queue.put(token("bad"))
+    queue.put(token("good"))
+    alert_id, _ = queue.claim("w1")
+    assert not queue.release(alert_id)
+    assert state(queue, alert_id) == PENDING
+
+    # The released alert waits out its backoff; the one behind it goes ahead
+    good_id, good = queue.claim("w1")
+    assert good["token_address"] == "good"
+    queue.ack(good_id)
+    assert queue.claim("w1") is None
+    clock.now += RETRY_DELAY
+    assert queue.claim("w1")[0] == alert_id
+
+    for attempt in range(2, MAX_ATTEMPTS + 1):
+        failed = queue.release(alert_id)
+        assert failed == (attempt == MAX_ATTEMPTS)
+        clock.now += 10_000
+        if not failed:
+            assert queue.claim("w1")[0] == alert_id
+    assert state(queue, alert_id) == FAILED
+    assert queue.claim("w1") is None
+
+
+def test_release_of_unknown_alert(queue):
+    assert not queue.release(12345)
+
+
+def test_claim_batch_waits_for_window_or_size(queue, clock):
+    ids = []
+    for address in ("a", "b", "c"):
+        queue.put(token(address))
+        alert_id, _ = queue.claim("w1")
+        queue.batch(alert_id, "default")
+        ids.append(alert_id)
+    assert state(queue, ids[0]) == BATCHED
+    assert queue.batched_destinations() == ["default"]
+
+    assert queue.claim_batch("default", "w1", window=60, max_tokens=10) == []
+    assert [a for a, _ in queue.claim_batch("default", "w1", window=60, max_tokens=2)] == ids[:2]
+    assert queue.claim_batch("default", "w1", window=60, max_tokens=2) == []
+    clock.now += 60
+    assert [a for a, _ in queue.claim_batch("default", "w1", window=60, max_tokens=2)] == ids[2:]
+    assert queue.batched_destinations() == []
+    assert queue.claim_batch("other", "w1", window=0, max_tokens=1) == []
+
+
+def test_batch_only_parks_claimed_alerts(queue):
+    queue.put(token("a"))
+    alert_id, _ = queue.claim("w1")
+    queue.ack(alert_id)
+    queue.batch(alert_id, "default")
+    assert state(queue, alert_id) == SENT
+
+
+def test_partial_delivery_is_remembered(queue):
+    queue.put(token("a"))
+    queue.put(token("b"))
+    ids = [queue.claim("w1")[0], queue.claim("w1")[0]]
+    assert queue.delivered_to(ids) == {ids[0]: set(), ids[1]: set()}
+    queue.mark_delivered(ids, "100")
+    queue.mark_delivered(ids[:1], "200")
+    assert queue.delivered_to(ids) == {ids[0]: {"100", "200"}, ids[1]: {"100"}}
+
+
+def test_prune_drops_old_finished_alerts(queue, clock):
+    queue.put(token("old-sent"))
+    queue.put(token("old-skipped"), deliver=False)
+    queue.put(token("old-pending"))
+    sent_id, _ = queue.claim("w1")
+    queue.ack(sent_id)
+    clock.now += 31 * 86400
+    queue.put(token("new-skipped"), deliver=False)
+
+    assert queue.prune(older_than_days=30) == 2
+    assert not queue.contains("old-sent")
+    assert not queue.contains("old-skipped")
+    assert queue.contains("old-pending")
+    assert queue.contains("new-skipped")
@@ -0,0 +1,70 @@
+import json
+
+from newpairs.feed_diff import FeedDiffer
+
+
+def feed(*addresses) -> bytes:
+    """A raw latest-profiles response, newest first."""
+    return json.dumps([{"tokenAddress": address, "chainId": "solana"} for address in addresses]).encode()
+
+
+def poll(differ: FeedDiffer, *addresses) -> list:
+    """Diff a response and process it the way Monitor.poll_once does."""
+    fresh = [p["tokenAddress"] for p in differ.diff(feed(*addresses))]
+    for address in fresh:
+        differ.mark_seen(address)
+    differ.commit()
+    return fresh
+
+
+def test_first_poll_returns_everything_and_repeat_nothing():
+    differ = FeedDiffer()
+    assert poll(differ, "c", "b", "a") == ["c", "b", "a"]
+    assert poll(differ, "c", "b", "a") == []
+
+
+def test_new_items_on_top():
+    differ = FeedDiffer()
+    poll(differ, "c", "b", "a")
+    assert poll(differ, "e", "d", "c", "b") == ["e", "d"]
+
+
+def test_reinserted_item_is_not_returned_again():
+    differ = FeedDiffer()
+    poll(differ, "c", "b", "a")
+    # "a" was re-listed and moved back to the top, next to a new token
+    assert poll(differ, "a", "d", "c", "b") == ["d"]
+
+
+def test_out_of_order_item_below_the_top_is_found():
+    differ = FeedDiffer()
+    poll(differ, "d", "c", "b", "a")
+    # "x" arrived late and was inserted between known items
+    assert poll(differ, "e", "d", "x", "c", "b", "a") == ["e", "x"]
+
+
+def test_reordered_known_items_are_skipped():
+    differ = FeedDiffer()
+    poll(differ, "d", "c", "b", "a")
+    assert poll(differ, "b", "d", "a", "c") == []
+
+
+def test_duplicates_in_one_response_are_returned_once():
+    differ = FeedDiffer()
+    assert poll(differ, "b", "a", "b") == ["b", "a"]
+
+
+def test_unprocessed_items_come_back():
+    differ = FeedDiffer()
+    poll(differ, "b", "a")
+    # The poll failed before marking anything as seen or committing
+    assert [p["tokenAddress"] for p in differ.diff(feed("d", "c", "b", "a"))] == ["d", "c"]
+    assert poll(differ, "d", "c", "b", "a") == ["d", "c"]
+
+
+def test_seen_set_is_bounded():
+    differ = FeedDiffer(max_seen=3)
+    poll(differ, "d", "c", "b", "a")
+    assert list(differ.seen) == ["c", "b", "a"]
+    # "d" was forgotten, but the unchanged tail still keeps it from being returned
+    assert poll(differ, "e", "d", "c", "b", "a") == ["e"]
@@ -0,0 +1,186 @@
+import os
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+import newpairs.token_store as token_store
+
+# One minute before midnight UTC
+LATE_EVENING = datetime(2025, 1, 1, 23, 59, tzinfo=timezone.utc).timestamp()
+DAY = 86400
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    """An empty archive in tmp_path, with the store's clock set to LATE_EVENING."""
+    archive = tmp_path / "token_archive"
+    for name, path in {
+        "ARCHIVE_DIR": archive,
+        "HOT_FILE": archive / "hot.jsonl",
+        "MANIFEST_FILE": archive / "manifest.json",
+        "UPDATES_FILE": archive / "updates.jsonl",
+        "LOCK_FILE": archive / ".lock",
+        "LEGACY_TOKEN_FILE": tmp_path / "tokens.json",
+        "CHAT_STATE_FILE": tmp_path / "chat_state.json",
+    }.items():
+        monkeypatch.setattr(token_store, name, str(path))
+    monkeypatch.setattr(token_store, "_hot_cache", {"stat": None, "addresses": set(), "first_at": None})
+    monkeypatch.setattr(token_store, "HOT_DAYS", 1)
+    monkeypatch.setattr(token_store, "RETENTION_DAYS", 0)
+    clock = FakeClock(LATE_EVENING)
+    monkeypatch.setattr(token_store, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def add(clock: FakeClock, address: str, **fields) -> dict:
+    return token_store.append_token({
+        "token_address": address, "chain_id": "solana", "followers": None,
+        "seen_at": int(clock.now), **fields,
+    })
+
+
+def addresses(tokens) -> list:
+    return [t["token_address"] for t in tokens]
+
+
+def archive_files() -> set:
+    return set(os.listdir(token_store.ARCHIVE_DIR)) - {".lock"}
+
+
+def test_append_assigns_seq_and_skips_duplicates(clock):
+    assert add(clock, "a")["seq"] == 1
+    assert add(clock, "b", chain_id="base")["seq"] == 2
+    assert add(clock, "a") is None
+    assert addresses(token_store.load_tokens_after(0)) == ["a", "b"]
+    assert token_store.load_known_chains() == ["base", "solana"]
+
+
+def test_cursor_and_seq_ranges_across_midnight(clock):
+    add(clock, "a")
+    add(clock, "b")
+    clock.now += 120          # 00:01 the next day: the first append compacts yesterday
+    add(clock, "c")
+    add(clock, "d")
+
+    manifest = token_store._load_manifest()
+    assert manifest["last_seq"] == 4
+    assert manifest["segments"] == {
+        "2025-01-01": {"first_seq": 1, "last_seq": 2, "first_at": int(LATE_EVENING),
+                       "last_at": int(LATE_EVENING), "count": 2},
+    }
+    assert archive_files() == {"2025-01-01.jsonl.gz", "hot.jsonl", "manifest.json"}
+
+    # A cursor in yesterday's segment continues into today's hot file
+    assert addresses(token_store.load_tokens_after(0)) == ["a", "b", "c", "d"]
+    assert addresses(token_store.load_tokens_after(1)) == ["b", "c", "d"]
+    assert addresses(token_store.load_tokens_after(2)) == ["c", "d"]
+    assert token_store.load_tokens_after(4) == []
+    assert token_store.load_token(2)["token_address"] == "b"
+    assert token_store.load_token(3)["token_address"] == "c"
+    assert token_store.load_token(5) is None
+
+    since = LATE_EVENING + 60
+    assert addresses(token_store.scan_tokens(since=since)) == ["c", "d"]
+    assert addresses(token_store.scan_tokens(until=since)) == ["a", "b"]
+
+
+def test_retention_drops_old_segments(clock, monkeypatch):
+    monkeypatch.setattr(token_store, "RETENTION_DAYS", 2)
+    add(clock, "day1")
+    for address in ("day2", "day3", "day4"):
+        clock.now += DAY
+        add(clock, address)
+
+    segments = token_store._load_manifest()["segments"]
+    assert sorted(segments) == ["2025-01-02", "2025-01-03"]
+    assert "2025-01-01.jsonl.gz" not in archive_files()
+    assert addresses(token_store.load_tokens_after(0)) == ["day2", "day3", "day4"]
+    assert token_store.load_token(1) is None
+
+
+def test_compaction_after_a_crash_keeps_one_copy(clock):
+    add(clock, "a")
+    add(clock, "b")
+    manifest = token_store._load_manifest()
+    hot = list(token_store._read_segment(token_store.HOT_FILE, compressed=False))
+    now = clock.now + DAY
+
+    assert token_store._compact(manifest, hot, now) == []
+    # A crash before the hot file was rewritten repeats the same compaction
+    token_store._compact(manifest, hot, now)
+    stored = list(token_store._read_segment(token_store._segment_path("2025-01-01"), compressed=True))
+    assert addresses(stored) == ["a", "b"]
+    assert manifest["segments"]["2025-01-01"]["count"] == 2
+
+
+def test_updates_are_read_before_they_are_merged(clock):
+    add(clock, "old")
+    clock.now += 120
+    add(clock, "new")
+    hot_before = open(token_store.HOT_FILE).read()
+
+    token_store.update_tokens([{**token_store.load_token(1), "followers": 10}])
+    token_store.update_tokens([{**token_store.load_token(2), "followers": 20}])
+    token_store.update_tokens([{**token_store.load_token(2), "followers": 21}])
+
+    # Neither the segment nor the hot file was rewritten for the late results
+    assert open(token_store.HOT_FILE).read() == hot_before
+    assert "updates.jsonl" in archive_files()
+    assert [t["followers"] for t in token_store.load_tokens_after(0)] == [10, 21]
+    assert token_store.load_token(1)["followers"] == 10
+    assert token_store.load_token(2)["followers"] == 21
+
+
+def test_updates_are_merged_when_many(clock, monkeypatch):
+    monkeypatch.setattr(token_store, "MERGE_UPDATES_AT", 2)
+    add(clock, "old")
+    clock.now += 120
+    add(clock, "new")
+
+    token_store.update_tokens([{**token_store.load_token(1), "followers": 10}])
+    token_store.update_tokens([{**token_store.load_token(2), "followers": 20}])
+
+    assert "updates.jsonl" not in archive_files()
+    segment = token_store._read_segment(token_store._segment_path("2025-01-01"), compressed=True)
+    hot = token_store._read_segment(token_store.HOT_FILE, compressed=False)
+    assert [t["followers"] for t in segment] == [10]
+    assert [t["followers"] for t in hot] == [20]
+    assert token_store._load_manifest()["segments"]["2025-01-01"]["count"] == 1
+
+
+def test_updates_are_merged_before_compaction(clock):
+    add(clock, "a")
+    token_store.update_tokens([{**token_store.load_token(1), "followers": 10}])
+    clock.now += 120
+    add(clock, "b")
+
+    assert "updates.jsonl" not in archive_files()
+    segment = token_store._read_segment(token_store._segment_path("2025-01-01"), compressed=True)
+    assert [t["followers"] for t in segment] == [10]
+
+
+def test_legacy_tokens_are_imported_once(clock):
+    with open(token_store.LEGACY_TOKEN_FILE, "w") as f:
+        f.write('[{"token_address": "x", "chain_id": "eth"}, {"token_address": "y", "chain_id": "eth"}]')
+    os.utime(token_store.LEGACY_TOKEN_FILE, (LATE_EVENING - DAY, LATE_EVENING - DAY))
+
+    assert add(clock, "z")["seq"] == 3
+    assert addresses(token_store.load_tokens_after(0)) == ["x", "y", "z"]
+    assert sorted(token_store._load_manifest()["segments"]) == ["2024-12-31"]
+
+
+def test_chat_state(clock):
+    assert token_store.load_chat_state(1) == token_store.DEFAULT_CHAT_STATE
+    token_store.update_chat_state(1, cursor=5, subscribed=True)
+    token_store.update_chat_state(2, follower_filter=100)
+    assert token_store.load_chat_state(1)["cursor"] == 5
+    assert list(token_store.load_subscribed_chats()) == [1]
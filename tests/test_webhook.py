@@ -0,0 +1,125 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import newpairs.webhook
+from newpairs.webhook import MAX_HEADERS, SECRET_HEADER, WebhookServer
+
+SECRET = "test-secret"
+
+# A /start message as Telegram pushes it to the webhook
+RECORDED_UPDATE = {
+    "update_id": 123456789,
+    "message": {
+        "message_id": 42,
+        "date": 1739900000,
+        "chat": {"id": 1001, "type": "private", "first_name": "Test"},
+        "from": {"id": 1001, "is_bot": False, "first_name": "Test"},
+        "text": "/start",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    },
+}
+
+
+async def post(port: int, body: bytes, secret: str = SECRET, path: str = "/telegram") -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: localhost\r\n{SECRET_HEADER}: {secret}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1]) if status_line else None
+
+
+async def send_raw(port: int, data: bytes) -> int:
+    """Send raw (possibly incomplete) request bytes and return the response status."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1]) if status_line else None
+
+
+def serve(scenario):
+    """Start a WebhookServer on a free port, run `await scenario(port)`, return (result, queued updates)."""
+    async def run():
+        app = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        server = WebhookServer(app, SECRET, listen="127.0.0.1", port=0)
+        await server.start()
+        try:
+            result = await scenario(server.port)
+        finally:
+            await server.stop()
+        updates = []
+        while not app.update_queue.empty():
+            updates.append(app.update_queue.get_nowait())
+        return result, updates
+
+    return asyncio.run(run())
+
+
+def replay(*requests):
+    """Send the requests one after another; return (statuses, queued updates)."""
+    async def scenario(port):
+        return [await post(port, **request) for request in requests]
+
+    return serve(scenario)
+
+
+def test_recorded_update_is_queued():
+    statuses, updates = replay({"body": json.dumps(RECORDED_UPDATE).encode()})
+    assert statuses == [200]
+    assert len(updates) == 1
+    assert updates[0].update_id == 123456789
+    assert updates[0].message.text == "/start"
+    assert updates[0].effective_chat.id == 1001
+
+
+def test_wrong_secret_is_rejected():
+    statuses, updates = replay({"body": json.dumps(RECORDED_UPDATE).encode(), "secret": "wrong"})
+    assert statuses == [403]
+    assert updates == []
+
+
+def test_unknown_path_is_not_found():
+    statuses, _ = replay({"body": b"{}", "path": "/other"})
+    assert statuses == [404]
+
+
+def test_invalid_bodies_are_bad_requests():
+    statuses, updates = replay({"body": b"not json"}, {"body": b"[1, 2]"}, {"body": b'"x"'})
+    assert statuses == [400, 400, 400]
+    assert updates == []
+
+
+def test_slow_clients_time_out(monkeypatch):
+    monkeypatch.setattr(newpairs.webhook, "READ_TIMEOUT", 0.2)
+    headers = f"POST /telegram HTTP/1.1\r\n{SECRET_HEADER}: {SECRET}\r\nContent-Length: 100\r\n\r\n"
+
+    async def scenario(port):
+        return [
+            await send_raw(port, b"POST /telegram HTTP/1.1\r\n"),   # headers never finish
+            await send_raw(port, headers.encode() + b'{"update_id":'),  # body never finishes
+        ]
+
+    statuses, updates = serve(scenario)
+    assert statuses == [408, 408]
+    assert updates == []
+
+
+def test_oversized_headers_are_rejected():
+    many = "".join(f"X-Filler-{i}: x\r\n" for i in range(MAX_HEADERS + 1))
+    huge = f"X-Filler: {'x' * 20000}\r\n"
+
+    async def scenario(port):
+        return [
+            await send_raw(port, f"POST /telegram HTTP/1.1\r\n{headers}\r\n".encode())
+            for headers in (many, huge)
+        ]
+
+    statuses, updates = serve(scenario)
+    assert statuses == [400, 400]
+    assert updates == []